@@ -0,0 +1,89 @@
+import logging
+import time
+from itertools import islice
+
+from neo4j.exceptions import ServiceUnavailable, SessionExpired, TransientError
+
+import Constants
+
+UNAVAILABLE_ERRORS = (ServiceUnavailable, SessionExpired)
+
+
+class AdaptiveBatcher:
+    """
+    Commits rows in chunks whose size follows the observed commit latency: a chunk that commits well under the target
+    latency doubles the next chunk, a slow one halves it. A chunk failing with a TransientError (e.g. a transaction
+    memory limit) halves the size too and is split and retried at the smaller size, down to min_size. A chunk failing on
+    its data is bisected until the offending rows are isolated, so the good rows are still committed and every bad row
+    is reported with the reason of its failure. Connection failures, and transient failures at min_size, abort the run:
+    the rows are not at fault, and the chunk is left for a resumed run.
+    """
+
+    def __init__(self, initial_size=Constants.BATCH_SIZE, min_size=1, max_size=Constants.MAX_BATCH_SIZE,
+                 target_seconds=Constants.TARGET_COMMIT_SECONDS):
+        """
+        :param initial_size: size of the first chunk.
+        :param min_size: smallest chunk size used after a slow or transiently failed commit.
+        :param max_size: largest chunk size, bounds the memory needed by one transaction on the server.
+        :param target_seconds: commit latency the chunk size is adjusted to.
+        """
+        self.chunk_size = initial_size
+        self.min_size = min_size
+        self.max_size = max_size
+        self.target_seconds = target_seconds
+        self.committed = 0
+        self.rejected = []  # [(row, reason)]
+
+    def run(self, rows, commit, on_chunk_committed=None, row_number=0):
+        """
+        :param rows: rows to commit (any iterable, e.g. read_csv_rows).
+        :param commit: function(chunk) that commits the chunk in one transaction and raises if it fails.
+        :param on_chunk_committed: optional function(row_number, chunk) called once every row of a chunk is committed
+                                   (e.g. IngestionJournal.record); a chunk with rejected rows is not reported, so a
+                                   resumed run retries it.
+        :param row_number: number of the first row, when rows do not start at the beginning of the file.
+        :return: number of rows committed.
+        :raises: the ServiceUnavailable or SessionExpired of a failed commit, or the TransientError of a chunk of
+                 min_size rows.
+        """
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                return self.committed
+            rejected = len(self.rejected)
+            self._commit_or_bisect(chunk, commit)
+            if on_chunk_committed is not None and len(self.rejected) == rejected:
+                on_chunk_committed(row_number, chunk)
+            row_number += len(chunk)
+
+    def _commit_or_bisect(self, chunk, commit):
+        start = time.perf_counter()
+        try:
+            commit(chunk)
+        except UNAVAILABLE_ERRORS:
+            raise
+        except TransientError:
+            if len(chunk) <= self.min_size:
+                raise
+            self._resize(failed=True)
+            size = min(self.chunk_size, max(self.min_size, len(chunk) // 2))
+            for start in range(0, len(chunk), size):
+                self._commit_or_bisect(chunk[start:start + size], commit)
+        except Exception as ex:
+            if len(chunk) == 1:
+                logging.error('row %s rejected: %s' % (chunk[0], ex))
+                self.rejected.append((chunk[0], str(ex)))
+                return
+            middle = len(chunk) // 2
+            self._commit_or_bisect(chunk[:middle], commit)
+            self._commit_or_bisect(chunk[middle:], commit)
+        else:
+            self.committed += len(chunk)
+            self._resize(elapsed=time.perf_counter() - start, size=len(chunk))
+
+    def _resize(self, failed=False, elapsed=0.0, size=0):
+        if failed or elapsed > 2 * self.target_seconds:
+            self.chunk_size = max(self.min_size, self.chunk_size // 2)
+        elif elapsed < self.target_seconds / 2 and size >= self.chunk_size:
+            self.chunk_size = min(self.max_size, self.chunk_size * 2)
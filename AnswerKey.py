@@ -0,0 +1,102 @@
+from collections import Counter, deque
+
+ANSWER_TABLE = str.maketrans('', '', ' \n\t')
+
+
+def normalize_answer(answer):
+    """
+    removes spaces, new lines and tabs and lower cases the answer, in one pass.
+    """
+    return answer.translate(ANSWER_TABLE).lower()
+
+
+class AnswerKey:
+    """
+    Correct options of a ticket, normalized once and compiled into an Aho-Corasick automaton, so an answer is matched
+    against every option in a single pass over its characters. Scores are the same as main.get_score: empty options
+    are skipped but still counted in the total, duplicated options count once per occurrence, and an option that is
+    empty once normalized (e.g. a single space) is found in every answer.
+    """
+
+    def __init__(self, correct_options):
+        """
+        :param correct_options: correct options of the question (see main.get_correct_options).
+        """
+        self.total = len(correct_options)
+        self.empty_hits = 0
+        self.option_counts = Counter()  # {normalized option: number of occurrences}
+        for option in correct_options:
+            if option == '' or option is None:
+                continue
+            option = normalize_answer(option)
+            if option == '':
+                self.empty_hits += 1
+            else:
+                self.option_counts[option] += 1
+        self.options = list(self.option_counts)
+        self._build_automaton()
+
+    def _build_automaton(self):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]  # indexes of the options ending at each state
+        for index, option in enumerate(self.options):
+            state = 0
+            for char in option:
+                if char not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                    self.goto[state][char] = len(self.goto) - 1
+                state = self.goto[state][char]
+            self.output[state].append(index)
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fail_state = self.fail[state]
+                while fail_state and char not in self.goto[fail_state]:
+                    fail_state = self.fail[fail_state]
+                self.fail[next_state] = self.goto[fail_state].get(char, 0)
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+
+    def find_options(self, normalized_answer):
+        """
+        :return: set of the indexes (in self.options) of the options contained in the normalized answer.
+        """
+        found = set()
+        state = 0
+        for char in normalized_answer:
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            if self.output[state]:
+                found.update(self.output[state])
+                if len(found) == len(self.options):
+                    break
+        return found
+
+    def score(self, student_answer):
+        found = self.find_options(normalize_answer(student_answer))
+        correct = self.empty_hits + sum(self.option_counts[self.options[index]] for index in found)
+        miss_hits = sum(self.option_counts.values()) + self.empty_hits - correct
+        return self.get_score_from_counts(correct, miss_hits, self.total)
+
+    def score_all(self, student_answers):
+        """
+        :return: list of the scores of the answers, in order.
+        """
+        return [self.score(student_answer) for student_answer in student_answers]
+
+    @staticmethod
+    def get_score_from_counts(correct, miss_hits, total_co):
+        if correct == 0:
+            return 0.0
+        if float(correct) / float(total_co) >= 0.1 and miss_hits > 0:
+            return (100 * float(correct) / float(total_co)) - 10
+        if miss_hits == 0:
+            return 100 * float(correct) / float(total_co)
+        if float(correct) / float(total_co) < 0.1 and miss_hits > 0:
+            return 0.0
+        return float(correct) / float(total_co)
@@ -0,0 +1,33 @@
+import asyncio
+
+from neo4j import AsyncGraphDatabase
+
+import Constants
+
+
+class AsyncGraphRepo:
+    driver = AsyncGraphDatabase.driver(Constants.URI, auth=('neo4j', 'kgopu1998'))
+    semaphore = asyncio.Semaphore(Constants.MAX_IN_FLIGHT)  # bounds the number of queries in flight
+
+    @classmethod
+    async def execute_query(cls, query, parameters=None):
+        async with cls.semaphore:
+            records, summary, keys = await cls.driver.execute_query(query_=query, parameters_=parameters)
+        return records, summary, keys
+
+    @classmethod
+    async def execute_queries(cls, query, parameters_list):
+        """
+        runs the same query once per parameters dict concurrently (bounded by the semaphore).
+        :return: list of records, in the order of parameters_list.
+        """
+        results = await asyncio.gather(*[cls.execute_query(query, parameters) for parameters in parameters_list])
+        return [records for records, summary, keys in results]
+
+    @classmethod
+    async def check_connectivity(cls):
+        await cls.driver.verify_connectivity()
+
+    @classmethod
+    async def close_connections(cls):
+        await cls.driver.close()
@@ -0,0 +1,129 @@
+import asyncio
+import logging
+
+import Constants
+import CypherTemplates
+from RelationDegreeIndex import RelationDegreeIndex
+from main import get_chunks, group_relations_by_name
+
+
+class AsyncRemoteGraphConstruction:
+    """
+    asyncio counterpart of RemoteGraphConstruction, built on an AsyncDriver (AsyncGraphDatabase.driver). A semaphore
+    bounds the number of transactions in flight, so one process can keep hundreds of them open without threads.
+    """
+
+    def __init__(self, max_in_flight=Constants.MAX_IN_FLIGHT):
+        self.max_in_flight = max_in_flight
+        self.semaphore = asyncio.Semaphore(max_in_flight)
+
+    async def insert_entity_instance(self, graph_db_driver, entity_name, entity_instance):
+        """
+        Creates entity instance and stores into the database
+        :param graph_db_driver: fully configured remote/local async database connection
+        :param entity_name: label( identifier to a Node)
+        :param entity_instance: a key-value map/dictionary consists of properties of the node.
+        :return: True, if node creation is successful.
+        """
+        try:
+            async with self.semaphore:
+                async with graph_db_driver.session(database='neo4j') as session:
+                    return await session.execute_write(self._insert_entity_tx, entity_name, entity_instance)
+        except Exception as ex:
+            logging.exception('exception, %s, occurred while creating node' % ex)
+            return False
+
+    @staticmethod
+    async def _insert_entity_tx(tx, entity_name, entity):
+        result = await tx.run(CypherTemplates.node_exists(entity_name), {Constants.ID: str(entity[Constants.ID])})
+        record = await result.single()
+        if record is not None:
+            raise Exception("Node ID with given label is already exists in database")
+        result = await tx.run(CypherTemplates.create_node(entity_name), {'props': entity})
+        record = await result.single()
+        return record is not None
+
+    async def insert_relationship_instance(self, graph_db_driver, subject_entity_name, predict_entity_name,
+                                           rel_instance):
+        """
+        :param graph_db_driver: fully configured remote/local async database connection
+        :param subject_entity_name: label name of the subject node
+        :param predict_entity_name: label name of the predict/object node.
+        :param rel_instance: parsed relation (see RemoteGraphConstruction.insert_relationship_instance)
+        :return: True, if relationship creation is successful
+        """
+        return await self.insert_relation_batch(graph_db_driver, subject_entity_name, predict_entity_name,
+                                                [rel_instance])
+
+    async def insert_entity_batch(self, graph_db_driver, entity_name, entity_rows, chunk_size=Constants.BATCH_SIZE):
+        """
+        merges the rows on id, one transaction per chunk, with up to max_in_flight chunks committing concurrently.
+        chunks are only read from entity_rows as earlier ones finish, so a streamed file is never fully in memory.
+        :return: (created, failed)
+        """
+        created = 0
+        failed = 0
+        pending = set()
+        for chunk in get_chunks(entity_rows, chunk_size):
+            if len(pending) >= self.max_in_flight:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    created += task.result()[0]
+                    failed += task.result()[1]
+            pending.add(asyncio.ensure_future(
+                self._write_chunk(graph_db_driver, self._merge_entity_chunk_tx, entity_name, chunk)))
+        for written, chunk_failed in await asyncio.gather(*pending):
+            created += written
+            failed += chunk_failed
+        return created, failed
+
+    async def _write_chunk(self, graph_db_driver, write_tx, *args):
+        chunk = args[-1]
+        try:
+            async with self.semaphore:
+                async with graph_db_driver.session(database='neo4j') as session:
+                    return await session.execute_write(write_tx, *args), 0
+        except Exception as ex:
+            logging.exception('exception, %s, occurred while writing a chunk' % ex)
+            return 0, len(chunk)
+
+    @staticmethod
+    async def _merge_entity_chunk_tx(tx, entity_name, entity_rows):
+        result = await tx.run(CypherTemplates.merge_nodes(entity_name), {'rows': entity_rows})
+        summary = await result.consume()
+        return summary.counters.nodes_created
+
+    async def insert_relation_batch(self, graph_db_driver, subject_label, predict_label, relation_rows):
+        """
+        inserts the parsed relations in one transaction; the whole batch is rolled back if any relation is invalid.
+        :return: True, if every relationship was created.
+        """
+        relation_rows = list(relation_rows)  # read twice and again if the driver retries the transaction
+        try:
+            async with self.semaphore:
+                async with graph_db_driver.session(database='neo4j') as session:
+                    await session.execute_write(self._insert_relation_batch_tx, subject_label, predict_label,
+                                                relation_rows)
+                    return True
+        except Exception as ex:
+            logging.exception('exception, %s, occurred while creating relationship' % ex)
+            return False
+
+    @staticmethod
+    async def _insert_relation_batch_tx(tx, subject_label, predict_label, relation_rows):
+        degree_index = RelationDegreeIndex(subject_label, predict_label)
+        for relation in relation_rows:
+            relation_name = relation[Constants.NAME]
+            subject = await (await tx.run(CypherTemplates.node_exists(subject_label),
+                                          {Constants.ID: relation[Constants.SUBJECT]})).single()
+            predict = await (await tx.run(CypherTemplates.node_exists(predict_label),
+                                          {Constants.ID: relation[Constants.PREDICT]})).single()
+            if relation_name not in degree_index.seeded_relations:
+                result = await tx.run(CypherTemplates.relation_degrees(subject_label, predict_label, relation_name))
+                degree_index.seed_from_record(relation_name, await result.single())
+            if subject is None or predict is None or not degree_index.is_functional_satisfied(relation):
+                raise Exception('relation cannot be formed')
+            degree_index.add(relation)
+        for relation_name, rows in group_relations_by_name(relation_rows).items():
+            await tx.run(CypherTemplates.create_relationships(subject_label, predict_label, relation_name),
+                         {'rows': rows})
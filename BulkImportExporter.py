@@ -0,0 +1,120 @@
+import argparse
+import csv
+import logging
+import os
+
+import Constants
+from main import get_label, get_subject_predict_label, parse_relation, read_csv_rows
+
+
+class BulkImportExporter:
+    """
+    Converts entity_* and rel-of-entity_* csv files into the node and relationship files of neo4j-admin database
+    import, for the first load of an empty database. Rows are streamed one at a time; only the ids of every label are
+    kept in memory, to check locally that every relationship points at an exported node.
+    """
+
+    def __init__(self, output_directory):
+        self.output_directory = output_directory
+        self.node_ids = {}  # {label: set of ids}
+        self.node_files = []  # [(label, path)]
+        self.relationship_files = []
+        self.related = {}  # {(subject label, predict label, relation name): {('subject' | 'predict', node id)}}
+        os.makedirs(output_directory, exist_ok=True)
+
+    def export_entity_file(self, file_path):
+        """
+        writes nodes_<file name>.csv with the header id:ID(<Label>), <other properties>..., :LABEL; one node file
+        per entity file, so several entity files of the same label are all imported.
+        :return: number of nodes exported.
+        """
+        name = os.path.splitext(os.path.basename(file_path))[0]
+        label = get_label(name.split(Constants.UNDERSCORE))
+        ids = self.node_ids.setdefault(label, set())
+        output_path = os.path.join(self.output_directory, 'nodes_' + name + Constants.DOT + Constants.CSV_EXTENSION)
+        count = 0
+        with open(output_path, Constants.WRITE, newline='') as output_file:
+            writer = None
+            for row in read_csv_rows(file_path):
+                if writer is None:
+                    properties = [key for key in row.keys() if key != Constants.ID]
+                    writer = csv.writer(output_file)
+                    writer.writerow([Constants.ID + ':ID(' + label + ')'] + properties + [':LABEL'])
+                node_id = row[Constants.ID]
+                if node_id in ids:
+                    logging.warning('duplicate id %s for label %s skipped' % (node_id, label))
+                    continue
+                ids.add(node_id)
+                writer.writerow([node_id] + [row[key] for key in properties] + [label])
+                count += 1
+        self.node_files.append((label, output_path))
+        return count
+
+    def export_relation_file(self, file_path):
+        """
+        writes a file of the same name with the header :START_ID(<Subject>), :END_ID(<Predict>), :TYPE.
+        relations whose subject or predict was not exported are reported and left out, and so are the relations that
+        break a FUNCTIONAL or INVERSE_FUNCTIONAL characteristic.
+        :return: (exported, rejected)
+        """
+        name = os.path.splitext(os.path.basename(file_path))[0]
+        subject_label, predict_label = get_subject_predict_label(name)
+        subject_ids = self.node_ids.get(subject_label, set())
+        predict_ids = self.node_ids.get(predict_label, set())
+        output_path = os.path.join(self.output_directory, name + Constants.DOT + Constants.CSV_EXTENSION)
+        exported = 0
+        rejected = 0
+        with open(output_path, Constants.WRITE, newline='') as output_file:
+            writer = csv.writer(output_file)
+            writer.writerow([':START_ID(' + subject_label + ')', ':END_ID(' + predict_label + ')', ':TYPE'])
+            for relation_row in read_csv_rows(file_path):
+                relation = parse_relation(relation_row)
+                subject, predict, relation_name = relation[Constants.SUBJECT], relation[Constants.PREDICT], relation[
+                    Constants.NAME]
+                if subject not in subject_ids or predict not in predict_ids:
+                    logging.warning('relation %s -> %s rejected: node not exported' % (subject, predict))
+                    rejected += 1
+                    continue
+                related = self.related.setdefault((subject_label, predict_label, relation_name), set())
+                if relation.get(Constants.FUNCTIONAL) == '1' and (Constants.SUBJECT, subject) in related:
+                    rejected += 1
+                    continue
+                if relation.get(Constants.INVERSE_FUNCTIONAL) == '1' and (Constants.PREDICT, predict) in related:
+                    rejected += 1
+                    continue
+                related.add((Constants.SUBJECT, subject))
+                related.add((Constants.PREDICT, predict))
+                writer.writerow([subject, predict, relation_name])
+                exported += 1
+        self.relationship_files.append(output_path)
+        return exported, rejected
+
+    def export_directory(self, directory):
+        """
+        exports every entity file first, so relation files can be checked against all exported ids.
+        """
+        file_names = sorted(os.listdir(directory))
+        for file_name in file_names:
+            if file_name.startswith(Constants.ENTITY) and file_name.endswith(Constants.DOT + Constants.CSV_EXTENSION):
+                print('%s : nodes = %d' % (file_name, self.export_entity_file(os.path.join(directory, file_name))))
+        for file_name in file_names:
+            if file_name.startswith(Constants.RELATION) and file_name.endswith(Constants.DOT + Constants.CSV_EXTENSION):
+                exported, rejected = self.export_relation_file(os.path.join(directory, file_name))
+                print('%s : relationships = %d rejected = %d' % (file_name, exported, rejected))
+
+    def get_import_command(self, database='neo4j'):
+        arguments = ['neo4j-admin database import full']
+        arguments += ['--nodes=%s=%s' % (label, path) for label, path in self.node_files]
+        arguments += ['--relationships=%s' % path for path in self.relationship_files]
+        arguments.append(database)
+        return ' '.join(arguments)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('directory', help='directory of entity_* and rel-of-entity_* csv files')
+    parser.add_argument('output_directory', help='directory the neo4j-admin import files are written to')
+    args = parser.parse_args()
+    exporter = BulkImportExporter(args.output_directory)
+    exporter.export_directory(args.directory)
+    print(exporter.get_import_command())
@@ -0,0 +1,93 @@
+import csv
+
+import numpy as np
+
+import Constants
+
+
+class CohortGain:
+    """
+    Learn gains of a whole cohort, computed column-wise with numpy. pre and post scores are aligned by student id, and
+    every gain follows the zero-denominator rules of the scalar functions of main (get_abs_gain, get_norm_gain,
+    get_sym_gain, get_wt_gain): a gain whose denominator is 0 is 0.0.
+    """
+    GAIN_COLUMNS = [Constants.ABS_GAIN, Constants.NORM_GAIN_ONE, Constants.NORM_GAIN_TWO, Constants.SYM_GAIN_TWO,
+                    Constants.WT_GAIN]
+
+    def __init__(self, student_ids, student_names, pre_scores, post_scores, sym_type=Constants.SYM_ONE):
+        """
+        :param student_ids: ids of the students, one per score.
+        :param student_names: names of the students, one per score.
+        :param pre_scores: entry scores.
+        :param post_scores: exit scores, aligned with pre_scores.
+        :param sym_type: Constants.SYM_ONE or Constants.SYM_TWO, as for get_sym_gain.
+        """
+        self.student_ids = list(student_ids)
+        self.student_names = list(student_names)
+        self.pre_scores = np.asarray(pre_scores, dtype=float)
+        self.post_scores = np.asarray(post_scores, dtype=float)
+        self.sym_type = sym_type
+        self.columns = self._compute_gains()
+
+    @classmethod
+    def from_rows(cls, entry_rows, exit_rows, sym_type=Constants.SYM_ONE):
+        """
+        aligns the points of the entry and exit rows by id. students without an exit row are left out, as in
+        insert_learning_gain_new; the first exit row of an id is used, as in get_post_score.
+        """
+        post_points = {}
+        for row in exit_rows:
+            post_points.setdefault(row[Constants.ID], row[Constants.POINTS])
+        student_ids, student_names, pre_scores, post_scores = [], [], [], []
+        for row in entry_rows:
+            if row[Constants.ID] not in post_points:
+                continue
+            student_ids.append(row[Constants.ID])
+            student_names.append(row[Constants.NAME])
+            pre_scores.append(float(row[Constants.POINTS]))
+            post_scores.append(float(post_points[row[Constants.ID]]))
+        return cls(student_ids, student_names, pre_scores, post_scores, sym_type)
+
+    @staticmethod
+    def _divide(numerator, denominator, where):
+        return np.divide(numerator, denominator, out=np.zeros_like(numerator), where=where)
+
+    def _compute_gains(self):
+        pre, post = self.pre_scores, self.post_scores
+        difference = post - pre
+        if self.sym_type == Constants.SYM_TWO:
+            sym_gain = self._divide(difference, pre + post, (pre != 0) & (post != 0) & (pre + post != 0))
+        else:
+            sym_gain = np.zeros_like(difference)
+        return {
+            Constants.ABS_GAIN: difference,
+            Constants.NORM_GAIN_ONE: self._divide(difference, 100 - pre, 100 - pre != 0),
+            Constants.NORM_GAIN_TWO: self._divide(difference, pre, pre != 0),
+            Constants.SYM_GAIN_TWO: sym_gain,
+            Constants.WT_GAIN: difference * pre / Constants.MUE,
+        }
+
+    def __len__(self):
+        return len(self.student_ids)
+
+    def rows(self, learn_gain_props=None):
+        """
+        yields {'student': student props, 'learn_gain': learn gain props} dictionaries, the rows of
+        main.create_student_learn_gains.
+        :param learn_gain_props: properties added to every learn gain, e.g. entry_id and exit_id.
+        """
+        columns = [self.columns[name].tolist() for name in self.GAIN_COLUMNS]
+        for index, student_id in enumerate(self.student_ids):
+            learn_gain = dict(learn_gain_props or {})
+            learn_gain.update(zip(self.GAIN_COLUMNS, (column[index] for column in columns)))
+            yield {'student': {Constants.ID: student_id, Constants.NAME: self.student_names[index]},
+                   'learn_gain': learn_gain}
+
+    def to_csv(self, path):
+        with open(path, Constants.WRITE, newline='') as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow([Constants.ID, Constants.NAME, 'pre_score', 'post_score'] + self.GAIN_COLUMNS)
+            columns = [self.pre_scores.tolist(), self.post_scores.tolist()] + [self.columns[name].tolist() for name in
+                                                                               self.GAIN_COLUMNS]
+            for index, student_id in enumerate(self.student_ids):
+                writer.writerow([student_id, self.student_names[index]] + [column[index] for column in columns])
@@ -8,6 +8,14 @@ RIGHT_ENTITY = 'R'
 RELATIONSHIP = 'Rel'
 LABEL = 'label'
 ID = 'id'
+BATCH_SIZE = 1000
+MAX_BATCH_SIZE = 50000
+TARGET_COMMIT_SECONDS = 1.0
+WORKERS = 4
+QUEUE_SIZE = 8
+MAX_IN_FLIGHT = 100
+SHARD_SIZE = 8 * 1024 * 1024
+JOURNAL_EXTENSION = '.journal'
 EQUALS = '='
 APPEND_R = 'r.+'
 APPEND_L = 'l.+'
@@ -72,3 +80,12 @@ SCORING_SCHEMA = {'Reading': 0.2,
                   'Project': 0.2,
                   'Exam': 0.2,
                   'Misc': 0.1}
+SUBMISSION = 'Submission'
+KNOWLEDGE_TICKET_LABEL = 'Knowledge_Ticket'
+LEARNING_OUTCOME = 'Learning_Outcome'
+LEARN_GAIN_STATS = 'Learn_Gain_Stats'
+COURSE_ID = 'course_id'
+STATS_SESSION_ID = 'session_id'
+HEXBIN_THRESHOLD = 5000
+SCORE_PREFIX = 'score_'
+PERFORMANCE = 'performance'
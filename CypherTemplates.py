@@ -0,0 +1,529 @@
+from functools import lru_cache
+
+import Constants
+
+
+def escape_name(name):
+    return '`' + str(name).replace('`', '``') + '`'
+
+
+@lru_cache(maxsize=None)
+def node_exists(label):
+    """
+    MATCH (n:<label> {id: $id}) RETURN n LIMIT 1
+    """
+    return 'MATCH (n:%s {%s: $id}) RETURN n LIMIT 1' % (escape_name(label), Constants.ID)
+
+
+@lru_cache(maxsize=None)
+def create_node(label):
+    """
+    CREATE (n:<label>) SET n = $props RETURN n
+    """
+    return 'CREATE (n:%s) SET n = $props RETURN n' % escape_name(label)
+
+
+@lru_cache(maxsize=None)
+def merge_nodes(label):
+    """
+    UNWIND $rows AS row MERGE (n:<label> {id: row.id}) ON CREATE SET n += row
+    """
+    return 'UNWIND $rows AS row MERGE (n:%s {%s: row.%s}) ON CREATE SET n += row' % (
+        escape_name(label), Constants.ID, Constants.ID)
+
+
+@lru_cache(maxsize=None)
+def node_ids(label):
+    """
+    MATCH (n:<label>) RETURN n.id AS id
+    """
+    return 'MATCH (n:%s) RETURN n.%s AS id' % (escape_name(label), Constants.ID)
+
+
+@lru_cache(maxsize=None)
+def relation_degrees(subject_label, predict_label, rel_type):
+    """
+    MATCH (s:<subject_label>)-[:<rel_type>]->(p:<predict_label>)
+    RETURN collect(s.id) AS subjects, collect(p.id) AS predicts
+    """
+    return 'MATCH (s:%s)-[:%s]->(p:%s) RETURN collect(s.%s) AS subjects, collect(p.%s) AS predicts' % (
+        escape_name(subject_label), escape_name(rel_type), escape_name(predict_label), Constants.ID, Constants.ID)
+
+
+@lru_cache(maxsize=None)
+def create_relationship(subject_label, predict_label, rel_type):
+    """
+    MATCH (l:<subject_label> {id: $subject}) MATCH (r:<predict_label> {id: $predict}) CREATE (l)-[rel:<rel_type>]->(r)
+    """
+    return 'MATCH (l:%s {%s: $%s}) MATCH (r:%s {%s: $%s}) CREATE (l)-[rel:%s]->(r)' % (
+        escape_name(subject_label), Constants.ID, Constants.SUBJECT, escape_name(predict_label), Constants.ID,
+        Constants.PREDICT, escape_name(rel_type))
+
+
+@lru_cache(maxsize=None)
+def create_relationships(subject_label, predict_label, rel_type):
+    """
+    UNWIND $rows AS row
+    MATCH (l:<subject_label> {id: row.subject})
+    MATCH (r:<predict_label> {id: row.predict})
+    CREATE (l)-[:<rel_type>]->(r)
+    """
+    return 'UNWIND $rows AS row ' \
+           'MATCH (l:%s {%s: row.%s}) MATCH (r:%s {%s: row.%s}) CREATE (l)-[:%s]->(r)' % (
+               escape_name(subject_label), Constants.ID, Constants.SUBJECT, escape_name(predict_label), Constants.ID,
+               Constants.PREDICT, escape_name(rel_type))
+
+
+@lru_cache(maxsize=None)
+def merge_relationships(subject_label, predict_label, rel_type):
+    """
+    UNWIND $rows AS row
+    MATCH (l:<subject_label> {id: row.subject})
+    MATCH (r:<predict_label> {id: row.predict})
+    MERGE (l)-[:<rel_type>]->(r)
+    """
+    return 'UNWIND $rows AS row ' \
+           'MATCH (l:%s {%s: row.%s}) MATCH (r:%s {%s: row.%s}) MERGE (l)-[:%s]->(r)' % (
+               escape_name(subject_label), Constants.ID, Constants.SUBJECT, escape_name(predict_label), Constants.ID,
+               Constants.PREDICT, escape_name(rel_type))
+
+
+@lru_cache(maxsize=None)
+def student_learn_gain():
+    """
+    the learn gain of a student among the gains counted in the stats of the session (see _course_session_learn_gains).
+    WITH $course_id AS course_id, $session_id AS session_id
+    <_course_session_learn_gains>
+    WITH student, learn_gain WHERE student.id = $student_id
+    RETURN learn_gain.abs_gain AS gain
+    """
+    return 'WITH $course_id AS course_id, $session_id AS session_id ' + _course_session_learn_gains() + \
+        'WITH student, learn_gain WHERE student.%s = $student_id RETURN learn_gain.%s AS gain' % (
+            Constants.ID, Constants.ABS_GAIN)
+
+
+@lru_cache(maxsize=None)
+def session_learn_gains():
+    """
+    MATCH (course:Course_Instance)-[r1:HAS_STUDENTS]->(student:Student)-[r2:HAS_LEARN_GAIN]->(learn_gain:Learn_Gain)
+    WHERE course.id = $course_id AND learn_gain.entry_id = $session_id
+    RETURN learn_gain.abs_gain AS gain
+    """
+    return 'MATCH (course:%s)-[r1:HAS_STUDENTS]->(student:%s)-[r2:%s]->(learn_gain:%s) ' \
+           'WHERE course.%s = $course_id AND learn_gain.%s = $session_id ' \
+           'RETURN learn_gain.%s AS gain' % (
+               Constants.COURSE_INSTANCE, Constants.STUDENT, Constants.STU_LG_REL, Constants.LEARN_GAIN, Constants.ID,
+               Constants.ENTRY_ID, Constants.ABS_GAIN)
+
+
+def _course_session_learn_gains():
+    """
+    the learn gains of session_id in course_id (variables in scope), with their student; shared by the stats, the
+    session feedback and get_student_learn_gain so they all see the same gains. learn gains are stamped with the course
+    they were created for; older ones, without course_id, are reached through the course as before.
+    CALL {
+        WITH course_id, session_id
+        MATCH (student:Student)-[:HAS_LEARN_GAIN]->(learn_gain:Learn_Gain)
+        WHERE learn_gain.entry_id = session_id AND learn_gain.course_id = course_id
+        RETURN student, learn_gain
+        UNION
+        WITH course_id, session_id
+        MATCH (course:Course_Instance {id: course_id})-[:HAS_STUDENTS]->(student:Student)-[:HAS_LEARN_GAIN]->
+              (learn_gain:Learn_Gain)
+        WHERE learn_gain.entry_id = session_id AND learn_gain.course_id IS NULL
+        RETURN student, learn_gain
+    }
+    """
+    return 'CALL { WITH course_id, session_id ' \
+           'MATCH (student:%s)-[:%s]->(learn_gain:%s) ' \
+           'WHERE learn_gain.%s = session_id AND learn_gain.%s = course_id ' \
+           'RETURN student, learn_gain ' \
+           'UNION WITH course_id, session_id ' \
+           'MATCH (course:%s {%s: course_id})-[:HAS_STUDENTS]->(student:%s)-[:%s]->(learn_gain:%s) ' \
+           'WHERE learn_gain.%s = session_id AND learn_gain.%s IS NULL ' \
+           'RETURN student, learn_gain } ' % (
+               Constants.STUDENT, Constants.STU_LG_REL, Constants.LEARN_GAIN, Constants.ENTRY_ID, Constants.COURSE_ID,
+               Constants.COURSE_INSTANCE, Constants.ID, Constants.STUDENT, Constants.STU_LG_REL, Constants.LEARN_GAIN,
+               Constants.ENTRY_ID, Constants.COURSE_ID)
+
+
+def _rebuild_learn_gain_stats():
+    """
+    recomputes the Learn_Gain_Stats node of session_id in course_id (variables in scope) from all its learn gains.
+    <_course_session_learn_gains>
+    WITH course_id, session_id, collect(learn_gain.abs_gain) AS gains WHERE size(gains) > 0
+    WITH course_id, session_id, gains, size(gains) AS n,
+         reduce(total = 0.0, gain IN gains | total + gain) / size(gains) AS mean
+    MERGE (stats:Learn_Gain_Stats {course_id: course_id, session_id: session_id})
+    SET stats.count = n, stats.mean = mean, stats.m2 = reduce(total = 0.0, gain IN gains | total + (gain - mean) ^ 2)
+    """
+    return _course_session_learn_gains() + \
+        'WITH course_id, session_id, collect(learn_gain.%s) AS gains WHERE size(gains) > 0 ' \
+        'WITH course_id, session_id, gains, size(gains) AS n, ' \
+        'reduce(total = 0.0, gain IN gains | total + gain) / size(gains) AS mean ' \
+        'MERGE (stats:%s {%s: course_id, %s: session_id}) ' \
+        'SET stats.count = n, stats.mean = mean, ' \
+        'stats.m2 = reduce(total = 0.0, gain IN gains | total + (gain - mean) ^ 2) ' % (
+            Constants.ABS_GAIN, Constants.LEARN_GAIN_STATS, Constants.COURSE_ID, Constants.STATS_SESSION_ID)
+
+
+@lru_cache(maxsize=None)
+def update_learn_gain_stats():
+    """
+    tail of the statements creating learn gains: merges the created gains of every session into its existing
+    Learn_Gain_Stats node (Chan et al. parallel variance); a session without stats yet gets them computed from all its
+    learn gains, the created ones included (see _rebuild_learn_gain_stats). returns the number of created learn gains.
+    WITH learn_gain.course_id AS course_id, learn_gain.entry_id AS session_id, collect(learn_gain.abs_gain) AS gains
+    CALL {
+        WITH course_id, session_id, gains
+        MATCH (stats:Learn_Gain_Stats {course_id: course_id, session_id: session_id})
+        WITH stats, gains, size(gains) AS n_b, reduce(total = 0.0, gain IN gains | total + gain) / size(gains) AS mean_b
+        WITH stats, n_b, mean_b, reduce(total = 0.0, gain IN gains | total + (gain - mean_b) ^ 2) AS m2_b,
+             stats.count AS n_a, stats.mean AS mean_a, stats.m2 AS m2_a
+        SET stats.count = n_a + n_b, stats.mean = mean_a + (mean_b - mean_a) * n_b / (n_a + n_b),
+            stats.m2 = m2_a + m2_b + (mean_b - mean_a) ^ 2 * n_a * n_b / (n_a + n_b)
+    }
+    CALL {
+        WITH course_id, session_id
+        WITH course_id, session_id
+        WHERE session_id IS NOT NULL AND NOT EXISTS { MATCH (:Learn_Gain_Stats {course_id: course_id,
+                                                                                 session_id: session_id}) }
+        <_rebuild_learn_gain_stats>
+    }
+    RETURN sum(size(gains)) AS created
+    """
+    return 'WITH learn_gain.%s AS course_id, learn_gain.%s AS session_id, collect(learn_gain.%s) AS gains ' \
+           'CALL { WITH course_id, session_id, gains ' \
+           'MATCH (stats:%s {%s: course_id, %s: session_id}) ' \
+           'WITH stats, gains, size(gains) AS n_b, ' \
+           'reduce(total = 0.0, gain IN gains | total + gain) / size(gains) AS mean_b ' \
+           'WITH stats, n_b, mean_b, reduce(total = 0.0, gain IN gains | total + (gain - mean_b) ^ 2) AS m2_b, ' \
+           'stats.count AS n_a, stats.mean AS mean_a, stats.m2 AS m2_a ' \
+           'SET stats.count = n_a + n_b, stats.mean = mean_a + (mean_b - mean_a) * n_b / (n_a + n_b), ' \
+           'stats.m2 = m2_a + m2_b + (mean_b - mean_a) ^ 2 * n_a * n_b / (n_a + n_b) } ' \
+           'CALL { WITH course_id, session_id ' \
+           'WITH course_id, session_id WHERE session_id IS NOT NULL AND ' \
+           'NOT EXISTS { MATCH (:%s {%s: course_id, %s: session_id}) } ' % (
+               Constants.COURSE_ID, Constants.ENTRY_ID, Constants.ABS_GAIN, Constants.LEARN_GAIN_STATS,
+               Constants.COURSE_ID, Constants.STATS_SESSION_ID, Constants.LEARN_GAIN_STATS, Constants.COURSE_ID,
+               Constants.STATS_SESSION_ID) + _rebuild_learn_gain_stats() + '} ' \
+        'RETURN sum(size(gains)) AS created'
+
+
+@lru_cache(maxsize=None)
+def create_student_learn_gains():
+    """
+    UNWIND $rows AS row
+    MERGE (student:Student {id: row.student.id}) ON CREATE SET student += row.student
+    WITH student, row
+    MATCH (course:Course_Instance {id: $course_id})
+    CREATE (learn_gain:Learn_Gain) SET learn_gain = row.learn_gain, learn_gain.course_id = $course_id
+    CREATE (course)-[:HAS_STUDENTS]->(student)-[:HAS_LEARN_GAIN]->(learn_gain)
+    <update_learn_gain_stats>
+    """
+    return 'UNWIND $rows AS row ' \
+           'MERGE (student:%s {%s: row.student.%s}) ON CREATE SET student += row.student ' \
+           'WITH student, row ' \
+           'MATCH (course:%s {%s: $course_id}) ' \
+           'CREATE (learn_gain:%s) SET learn_gain = row.learn_gain, learn_gain.%s = $course_id ' \
+           'CREATE (course)-[:HAS_STUDENTS]->(student)-[:%s]->(learn_gain) ' % (
+               Constants.STUDENT, Constants.ID, Constants.ID, Constants.COURSE_INSTANCE, Constants.ID,
+               Constants.LEARN_GAIN, Constants.COURSE_ID, Constants.STU_LG_REL) + update_learn_gain_stats()
+
+
+@lru_cache(maxsize=None)
+def create_student_ticket_learn_gains():
+    """
+    same as create_student_learn_gains, with every learn gain linked to the entry ticket:
+    ... CREATE (course)-[:HAS_STUDENTS]->(student)-[:HAS_LEARN_GAIN]->(learn_gain)-[:BELONGS_TO_TICKET]->(ticket)
+    where ticket is MATCH (ticket:Knowledge_Ticket {id: $entry_id})
+    """
+    return 'UNWIND $rows AS row ' \
+           'MERGE (student:%s {%s: row.student.%s}) ON CREATE SET student += row.student ' \
+           'WITH student, row ' \
+           'MATCH (course:%s {%s: $course_id}) ' \
+           'MATCH (ticket:%s {%s: $entry_id}) ' \
+           'CREATE (learn_gain:%s) SET learn_gain = row.learn_gain, learn_gain.%s = $course_id ' \
+           'CREATE (course)-[:HAS_STUDENTS]->(student)-[:%s]->(learn_gain)-[:BELONGS_TO_TICKET]->(ticket) ' % (
+               Constants.STUDENT, Constants.ID, Constants.ID, Constants.COURSE_INSTANCE, Constants.ID,
+               Constants.KNOWLEDGE_TICKET_LABEL, Constants.ID, Constants.LEARN_GAIN, Constants.COURSE_ID,
+               Constants.STU_LG_REL) + \
+           update_learn_gain_stats()
+
+
+@lru_cache(maxsize=None)
+def learn_gain_stats():
+    """
+    MATCH (stats:Learn_Gain_Stats {course_id: $course_id, session_id: $session_id})
+    RETURN stats.count AS count, stats.mean AS mean, stats.m2 AS m2
+    """
+    return 'MATCH (stats:%s {%s: $course_id, %s: $session_id}) ' \
+           'RETURN stats.count AS count, stats.mean AS mean, stats.m2 AS m2' % (
+               Constants.LEARN_GAIN_STATS, Constants.COURSE_ID, Constants.STATS_SESSION_ID)
+
+
+@lru_cache(maxsize=None)
+def backfill_learn_gain_stats():
+    """
+    recomputes the stats of a session from its learn gains, selected as in update_learn_gain_stats.
+    WITH $course_id AS course_id, $session_id AS session_id
+    <_rebuild_learn_gain_stats>
+    RETURN stats.count AS count, stats.mean AS mean, stats.m2 AS m2
+    """
+    return 'WITH $course_id AS course_id, $session_id AS session_id ' + _rebuild_learn_gain_stats() + \
+        'RETURN stats.count AS count, stats.mean AS mean, stats.m2 AS m2'
+
+
+@lru_cache(maxsize=None)
+def session_student_learn_gains():
+    """
+    the learn gains counted in the stats of the session (see _course_session_learn_gains), with their student.
+    WITH $course_id AS course_id, $session_id AS session_id
+    <_course_session_learn_gains>
+    RETURN student.id AS student_id, learn_gain.abs_gain AS gain
+    """
+    return 'WITH $course_id AS course_id, $session_id AS session_id ' + _course_session_learn_gains() + \
+        'RETURN student.%s AS student_id, learn_gain.%s AS gain' % (Constants.ID, Constants.ABS_GAIN)
+
+
+@lru_cache(maxsize=None)
+def assessment_points_by_type():
+    """
+    MATCH (a:ASSESSMENT) WHERE a.type IN $types
+    RETURN a.type AS type, sum(toFloat(a.points)) AS points
+    """
+    return 'MATCH (a:%s) WHERE a.%s IN $types RETURN a.%s AS type, sum(toFloat(a.%s)) AS points' % (
+        Constants.ASSESSMENT, Constants.TYPE, Constants.TYPE, Constants.POINTS)
+
+
+@lru_cache(maxsize=None)
+def student_scores_by_type(some_students=False):
+    """
+    MATCH (stu:Student) [WHERE stu.id IN $student_ids]
+    OPTIONAL MATCH (stu)-[:HAS_A_SUBMISSION]->(sub:Submission)-[:BELONGS_TO_ASSESSMENT]->(a:ASSESSMENT)
+    WHERE a.type IN $types
+    RETURN stu.id AS student_id, a.type AS type, sum(toFloat(sub.score)) AS score
+    students without submissions of the given types come back once, with a null type.
+    """
+    return 'MATCH (stu:%s) %s' \
+           'OPTIONAL MATCH (stu)-[:HAS_A_SUBMISSION]->(sub:%s)-[:BELONGS_TO_ASSESSMENT]->(a:%s) ' \
+           'WHERE a.%s IN $types ' \
+           'RETURN stu.%s AS student_id, a.%s AS type, sum(toFloat(sub.%s)) AS score' % (
+               Constants.STUDENT, 'WHERE stu.%s IN $student_ids ' % Constants.ID if some_students else '',
+               Constants.SUBMISSION, Constants.ASSESSMENT, Constants.TYPE, Constants.ID, Constants.TYPE,
+               Constants.SCORE)
+
+
+@lru_cache(maxsize=None)
+def student_learn_gain_sums():
+    """
+    MATCH (s:Student) OPTIONAL MATCH (s)-[:HAS_LEARN_GAIN]->(l:Learn_Gain)
+    RETURN s.id AS id, sum(l.abs_gain) AS gain
+    """
+    return 'MATCH (s:%s) OPTIONAL MATCH (s)-[:%s]->(l:%s) RETURN s.%s AS id, sum(l.%s) AS gain' % (
+        Constants.STUDENT, Constants.STU_LG_REL, Constants.LEARN_GAIN, Constants.ID, Constants.ABS_GAIN)
+
+
+def _set_student_performance():
+    return 'SET stu.%s = reduce(total = 0.0, i IN range(0, size($types) - 1) | total + ' \
+           'CASE WHEN $totals[i] = 0.0 THEN 0.0 ' \
+           'ELSE coalesce(stu[\'%s\' + $types[i]], 0.0) / $totals[i] * $weights[i] END)' % (
+               Constants.PERFORMANCE, Constants.SCORE_PREFIX)
+
+
+@lru_cache(maxsize=None)
+def refresh_student_scores(types, by_assessment=False, missing_scores=False):
+    """
+    UNWIND $student_ids AS student_id MATCH (stu:Student {id: student_id})
+    (or, by_assessment: the students with a submission to one of the assessments $assessment_ids;
+     or, missing_scores: the students without one of the score_<type> properties, e.g. never refreshed)
+    WITH DISTINCT stu
+    CALL {
+        WITH stu
+        OPTIONAL MATCH (stu)-[:HAS_A_SUBMISSION]->(sub:Submission)-[:BELONGS_TO_ASSESSMENT]->(a:ASSESSMENT)
+        WHERE a.type IN $types
+        RETURN sum(CASE a.type WHEN <type> THEN toFloat(sub.score) END) AS score_<type>, ... (one per type)
+    }
+    SET stu.score_<type> = score_<type>, ...
+    SET stu.performance = reduce(total = 0.0, i IN range(0, size($types) - 1) |
+        total + CASE WHEN $totals[i] = 0.0 THEN 0.0 ELSE coalesce(stu['score_' + $types[i]], 0.0) / $totals[i] *
+        $weights[i] END)
+    RETURN count(stu) AS refreshed
+    :param types: tuple of the scoring types (labels and property names cannot be parameters).
+    """
+    score_names = [escape_name(Constants.SCORE_PREFIX + schema_type) for schema_type in types]
+    if by_assessment:
+        students = 'MATCH (touched:%s) WHERE touched.%s IN $assessment_ids ' \
+                   'MATCH (stu:%s)-[:HAS_A_SUBMISSION]->(:%s)-[:BELONGS_TO_ASSESSMENT]->(touched) ' % (
+                       Constants.ASSESSMENT, Constants.ID, Constants.STUDENT, Constants.SUBMISSION)
+    elif missing_scores:
+        students = 'MATCH (stu:%s) WHERE %s ' % (
+            Constants.STUDENT, ' OR '.join('stu.%s IS NULL' % score_name for score_name in score_names))
+    else:
+        students = 'UNWIND $student_ids AS student_id MATCH (stu:%s {%s: student_id}) ' % (
+            Constants.STUDENT, Constants.ID)
+    sums = ', '.join('sum(CASE a.%s WHEN $types[%d] THEN toFloat(sub.%s) END) AS %s' % (
+        Constants.TYPE, index, Constants.SCORE, score_name) for index, score_name in enumerate(score_names))
+    assignments = ', '.join('stu.%s = coalesce(%s, 0.0)' % (score_name, score_name) for score_name in score_names)
+    return students + 'WITH DISTINCT stu ' \
+                      'CALL { WITH stu ' \
+                      'OPTIONAL MATCH (stu)-[:HAS_A_SUBMISSION]->(sub:%s)-[:BELONGS_TO_ASSESSMENT]->(a:%s) ' \
+                      'WHERE a.%s IN $types ' \
+                      'RETURN %s } ' \
+                      'SET %s ' % (Constants.SUBMISSION, Constants.ASSESSMENT, Constants.TYPE, sums, assignments) + \
+        _set_student_performance() + ' RETURN count(stu) AS refreshed'
+
+
+@lru_cache(maxsize=None)
+def refresh_performances():
+    """
+    MATCH (stu:Student)
+    SET stu.performance = <as in refresh_student_scores, from the stored score_<type> properties>
+    RETURN count(stu) AS refreshed
+    the score_<type> properties must be materialized first (see refresh_student_scores, missing_scores).
+    """
+    return 'MATCH (stu:%s) ' % Constants.STUDENT + _set_student_performance() + ' RETURN count(stu) AS refreshed'
+
+
+@lru_cache(maxsize=None)
+def student_performances(single_student=False):
+    """
+    MATCH (stu:Student) [WHERE stu.id = $student_id] RETURN stu.id AS student_id, stu.performance AS performance
+    """
+    return 'MATCH (stu:%s) %sRETURN stu.%s AS student_id, stu.%s AS performance' % (
+        Constants.STUDENT, 'WHERE stu.%s = $student_id ' % Constants.ID if single_student else '', Constants.ID,
+        Constants.PERFORMANCE)
+
+
+@lru_cache(maxsize=None)
+def student_names():
+    """
+    MATCH (s:Student) WHERE s.name IS NOT NULL RETURN s.name AS name, s.id AS id
+    """
+    return 'MATCH (s:%s) WHERE s.%s IS NOT NULL RETURN s.%s AS name, s.%s AS id' % (
+        Constants.STUDENT, Constants.NAME, Constants.NAME, Constants.ID)
+
+
+@lru_cache(maxsize=None)
+def create_submissions():
+    """
+    UNWIND $rows AS row
+    MATCH (student:Student {id: row.student_id})
+    MATCH (assessment:ASSESSMENT {id: row.canvas_id})
+    CREATE (sub:Submission {id: row.canvas_id, score: row.score})
+    CREATE (student)-[:HAS_A_SUBMISSION]->(sub)-[:BELONGS_TO_ASSESSMENT]->(assessment)-[:BELONGS_TO_SUBMISSION]->(sub)
+    RETURN count(sub) AS created
+    """
+    return 'UNWIND $rows AS row ' \
+           'MATCH (student:%s {%s: row.student_id}) ' \
+           'MATCH (assessment:%s {%s: row.canvas_id}) ' \
+           'CREATE (sub:%s {%s: row.canvas_id, %s: row.score}) ' \
+           'CREATE (student)-[:HAS_A_SUBMISSION]->(sub)-[:BELONGS_TO_ASSESSMENT]->(assessment)' \
+           '-[:BELONGS_TO_SUBMISSION]->(sub) ' \
+           'RETURN count(sub) AS created' % (
+               Constants.STUDENT, Constants.ID, Constants.ASSESSMENT, Constants.ID, Constants.SUBMISSION, Constants.ID,
+               Constants.SCORE)
+
+
+@lru_cache(maxsize=None)
+def merge_instance_assessment_questions():
+    """
+    MERGE (i:Course_Instance {id: $instance_id})
+    MERGE (a:ASSESSMENT {id: $assessment_id})
+    MERGE (i)-[:Has_Assessment_Question]->(a)
+    WITH i
+    UNWIND $questions AS question
+    MERGE (q:Question {id: question.id}) ON CREATE SET q += question
+    MERGE (i)-[:Has_Assessment_Question]->(q)
+    RETURN count(q) AS questions
+    """
+    return 'MERGE (i:%s {%s: $instance_id}) ' \
+           'MERGE (a:%s {%s: $assessment_id}) ' \
+           'MERGE (i)-[:Has_Assessment_Question]->(a) ' \
+           'WITH i ' \
+           'UNWIND $questions AS question ' \
+           'MERGE (q:%s {%s: question.%s}) ON CREATE SET q += question ' \
+           'MERGE (i)-[:Has_Assessment_Question]->(q) ' \
+           'RETURN count(q) AS questions' % (
+               Constants.COURSE_INSTANCE, Constants.ID, Constants.ASSESSMENT, Constants.ID, Constants.QUESTION,
+               Constants.ID, Constants.ID)
+
+
+@lru_cache(maxsize=None)
+def enroll_students():
+    """
+    UNWIND $rows AS row
+    MERGE (s:Student {id: row.id}) ON CREATE SET s += row
+    WITH s
+    MATCH (i:Course_Instance {id: $instance_id})
+    MERGE (s)-[:enrolled_in]->(i)
+    MERGE (i)-[:enrolled_by]->(s)
+    RETURN count(s) AS enrolled
+    """
+    return 'UNWIND $rows AS row ' \
+           'MERGE (s:%s {%s: row.%s}) ON CREATE SET s += row ' \
+           'WITH s ' \
+           'MATCH (i:%s {%s: $instance_id}) ' \
+           'MERGE (s)-[:enrolled_in]->(i) ' \
+           'MERGE (i)-[:enrolled_by]->(s) ' \
+           'RETURN count(s) AS enrolled' % (
+               Constants.STUDENT, Constants.ID, Constants.ID, Constants.COURSE_INSTANCE, Constants.ID)
+
+
+@lru_cache(maxsize=None)
+def merge_sessions_outcomes_questions():
+    """
+    UNWIND $rows AS row
+    MERGE (s:Session {id: row.session.id}) ON CREATE SET s += row.session
+    MERGE (o:Learning_Outcome {id: row.outcome.id}) ON CREATE SET o += row.outcome
+    MERGE (q:Question {id: row.question.id}) ON CREATE SET q += row.question
+    MERGE (s)-[:HAS_OUTCOME]->(o)
+    MERGE (o)-[:IS_ASSESSED_BY]->(q)
+    MERGE (q)-[:ASSESSES]->(o)
+    RETURN count(s) AS sessions
+    """
+    return 'UNWIND $rows AS row ' \
+           'MERGE (s:%s {%s: row.session.%s}) ON CREATE SET s += row.session ' \
+           'MERGE (o:%s {%s: row.outcome.%s}) ON CREATE SET o += row.outcome ' \
+           'MERGE (q:%s {%s: row.question.%s}) ON CREATE SET q += row.question ' \
+           'MERGE (s)-[:HAS_OUTCOME]->(o) ' \
+           'MERGE (o)-[:IS_ASSESSED_BY]->(q) ' \
+           'MERGE (q)-[:ASSESSES]->(o) ' \
+           'RETURN count(s) AS sessions' % (
+               Constants.Session, Constants.ID, Constants.ID, Constants.LEARNING_OUTCOME, Constants.ID, Constants.ID,
+               Constants.QUESTION, Constants.ID, Constants.ID)
+
+
+@lru_cache(maxsize=None)
+def merge_tickets():
+    """
+    UNWIND $rows AS row
+    MERGE (k:Knowledge_Ticket {id: row.ticket.id}) ON CREATE SET k += row.ticket
+    WITH k, row
+    MATCH (s:Session {id: row.session_id})
+    MERGE (k)-[:BELONGS_TO]->(s)
+    RETURN count(k) AS tickets
+    """
+    return 'UNWIND $rows AS row ' \
+           'MERGE (k:%s {%s: row.ticket.%s}) ON CREATE SET k += row.ticket ' \
+           'WITH k, row ' \
+           'MATCH (s:%s {%s: row.session_id}) ' \
+           'MERGE (k)-[:BELONGS_TO]->(s) ' \
+           'RETURN count(k) AS tickets' % (
+               Constants.KNOWLEDGE_TICKET_LABEL, Constants.ID, Constants.ID, Constants.Session, Constants.ID)
+
+
+@lru_cache(maxsize=None)
+def update_assessments():
+    """
+    UNWIND $rows AS row
+    OPTIONAL MATCH (a:ASSESSMENT {id: row.id})
+    SET a += row.props
+    RETURN count(DISTINCT a) AS matched, collect(CASE WHEN a IS NULL THEN row.id END) AS missing
+    setting properties of a missing (null) assessment is a no-op, its id is reported in missing.
+    """
+    return 'UNWIND $rows AS row ' \
+           'OPTIONAL MATCH (a:%s {%s: row.%s}) ' \
+           'SET a += row.props ' \
+           'RETURN count(DISTINCT a) AS matched, collect(CASE WHEN a IS NULL THEN row.%s END) AS missing' % (
+               Constants.ASSESSMENT, Constants.ID, Constants.ID, Constants.ID)
@@ -7,8 +7,8 @@ class GraphRepo:
     driver = GraphDatabase.driver(Constants.URI, auth=('neo4j', 'kgopu1998'))
 
     @classmethod
-    def execute_query(cls, query):
-        records, summary, keys = cls.driver.execute_query(query_=query)
+    def execute_query(cls, query, parameters=None):
+        records, summary, keys = cls.driver.execute_query(query_=query, parameters_=parameters)
         return records, summary, keys
 
     @classmethod
@@ -0,0 +1,72 @@
+import hashlib
+import json
+import logging
+import os
+from itertools import chain, islice
+
+import Constants
+
+
+class IngestionJournal:
+    """
+    Progress journal of a chunked load, written next to the input file (<input>.journal). Every committed chunk is
+    appended as one json line: file, first row number, number of rows and a hash of the chunk. When resuming, the
+    committed prefix of the file is skipped chunk by chunk as long as the hashes match, so an edited input file is
+    re-applied instead of silently skipped. chunks are keyed by their first row, so their size may vary between runs
+    (see AdaptiveBatcher).
+    """
+
+    def __init__(self, input_path, resume=False):
+        """
+        :param input_path: path of the csv file being loaded.
+        :param resume: True, to keep the committed chunks of a previous run; otherwise the journal starts empty.
+        """
+        self.input_path = input_path
+        self.resume = resume
+        self.journal_path = input_path + Constants.JOURNAL_EXTENSION
+        self.committed = {}  # {first row number: (number of rows, chunk hash)}
+        if resume and os.path.exists(self.journal_path):
+            with open(self.journal_path, Constants.READ) as journal_file:
+                for line in journal_file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:  # a crash can leave a partially written last line
+                        continue
+                    self.committed[entry['row']] = (entry['rows'], entry['hash'])
+            logging.info('resuming %s: %d chunks already committed' % (input_path, len(self.committed)))
+        else:
+            open(self.journal_path, Constants.WRITE).close()
+
+    @staticmethod
+    def get_chunk_hash(chunk):
+        data = json.dumps([list(row.items()) for row in chunk], default=str)
+        return hashlib.sha1(data.encode()).hexdigest()
+
+    def skip_committed(self, rows):
+        """
+        :param rows: rows of the input file, from the first one.
+        :return: number of rows skipped and an iterator over the remaining rows.
+        """
+        rows = iter(rows)
+        row_number = 0
+        while row_number in self.committed:
+            size, chunk_hash = self.committed[row_number]
+            chunk = list(islice(rows, size))
+            if len(chunk) != size or self.get_chunk_hash(chunk) != chunk_hash:
+                return row_number, chain(chunk, rows)
+            row_number += size
+        return row_number, rows
+
+    def record(self, row_number, chunk):
+        """
+        :param row_number: number of the first row of the chunk, starting at 0.
+        :param chunk: rows of the chunk, just committed.
+        """
+        chunk_hash = self.get_chunk_hash(chunk)
+        entry = {'file': os.path.basename(self.input_path), 'row': row_number, 'rows': len(chunk),
+                 'hash': chunk_hash}
+        with open(self.journal_path, 'a') as journal_file:
+            journal_file.write(json.dumps(entry) + '\n')
+            journal_file.flush()
+            os.fsync(journal_file.fileno())
+        self.committed[row_number] = (len(chunk), chunk_hash)
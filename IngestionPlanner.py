@@ -0,0 +1,139 @@
+import argparse
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import Constants
+from IngestionJournal import IngestionJournal
+from ParallelCsvParser import parse_csv_in_parallel
+from SchemaManager import SchemaManager
+from main import get_label, get_subject_predict_label, create_nodes_in_batches, create_relationship_in_batches, \
+    parse_relation, read_csv_rows, get_labels_from_directory
+
+
+class IngestionPlanner:
+    """
+    Loads a directory of entity_* and rel-of-entity_* csv files. The labels in the file names give the dependencies:
+    a relation file waits for the entity files of its subject and predict labels (when they are part of the directory)
+    and for the previous relation file between the same labels, whose functional checks it must see. Every file whose
+    dependencies are loaded runs concurrently on a thread pool; relation files are parsed on one process pool shared
+    by all the threads (see parse_csv_in_parallel).
+    """
+
+    def __init__(self, directory, workers=Constants.WORKERS, resume=False):
+        """
+        :param directory: directory holding the csv files.
+        :param workers: number of files loaded at the same time.
+        :param resume: True, to skip the chunks already committed by a previous run (see IngestionJournal).
+        """
+        self.directory = directory
+        self.workers = workers
+        self.resume = resume
+        self.report = []  # [{'file', 'rows', 'seconds', 'rows_per_second', 'status'}]
+        self.parse_executor = None  # ProcessPoolExecutor shared by load_file while run is running
+
+    def build_plan(self):
+        """
+        :return: {file name: set of file names it depends on}
+        """
+        entity_files = {}  # {label: [file names]}, a label may be split across several files
+        relation_files = []
+        for file_name in sorted(os.listdir(self.directory)):
+            name, extension = os.path.splitext(file_name)
+            if extension != Constants.DOT + Constants.CSV_EXTENSION:
+                continue
+            if name.startswith(Constants.ENTITY):
+                entity_files.setdefault(get_label(name.split(Constants.UNDERSCORE)), []).append(file_name)
+            elif name.startswith(Constants.RELATION):
+                relation_files.append(file_name)
+        plan = {file_name: set() for file_names in entity_files.values() for file_name in file_names}
+        previous_relation_file = {}  # {(subject label, predict label): file name}
+        for file_name in relation_files:
+            labels = get_subject_predict_label(os.path.splitext(file_name)[0])
+            plan[file_name] = {entity_file for label in labels for entity_file in entity_files.get(label, [])}
+            if labels in previous_relation_file:
+                plan[file_name].add(previous_relation_file[labels])
+            previous_relation_file[labels] = file_name
+        return plan
+
+    def run(self):
+        plan = self.build_plan()
+        SchemaManager.ensure_schema(get_labels_from_directory(self.directory))
+        done = set()
+        running = {}  # {future: file name}
+        start = time.perf_counter()
+        with ThreadPoolExecutor(self.workers) as executor, ProcessPoolExecutor() as parse_executor:
+            self.parse_executor = parse_executor
+            while plan or running:
+                ready = [file_name for file_name, dependencies in plan.items() if dependencies <= done]
+                for file_name in ready:
+                    del plan[file_name]
+                    running[executor.submit(self.load_file, file_name)] = file_name
+                if not running:  # only files whose dependencies failed are left
+                    for file_name in plan:
+                        self.report.append({'file': file_name, 'rows': 0, 'seconds': 0.0, 'rows_per_second': 0.0,
+                                            'status': 'skipped, a dependency failed'})
+                    break
+                finished, pending = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    file_name = running.pop(future)
+                    if future.result():
+                        done.add(file_name)
+            self.parse_executor = None
+        self.print_report(time.perf_counter() - start)
+        return self.report
+
+    def load_file(self, file_name):
+        """
+        :return: True, if the file was loaded; an entity file with a failed chunk is not, so the relation files
+                 depending on it are skipped.
+        """
+        path = os.path.join(self.directory, file_name)
+        name = os.path.splitext(file_name)[0]
+        start = time.perf_counter()
+        try:
+            journal = IngestionJournal(path, self.resume)
+            if name.startswith(Constants.ENTITY):
+                chunk_counts = create_nodes_in_batches(get_label(name.split(Constants.UNDERSCORE)),
+                                                       read_csv_rows(path), journal=journal)
+                rows = sum(sum(count) for count in chunk_counts)
+                failed = sum(count[2] for count in chunk_counts)
+                status = 'created = %d skipped = %d failed = %d' % (sum(count[0] for count in chunk_counts),
+                                                                    sum(count[1] for count in chunk_counts), failed)
+            else:
+                subject_label, predict_label = get_subject_predict_label(name)
+                success, failure, skipped = create_relationship_in_batches(
+                    parse_csv_in_parallel(path, parse_relation, executor=self.parse_executor), subject_label,
+                    predict_label, parsed=True, journal=journal)
+                rows = success + failure + skipped
+                failed = 0  # rejected relations do not block other files
+                status = 'success = %d failure = %d skipped = %d' % (success, failure, skipped)
+        except Exception as ex:
+            logging.exception('exception, %s, occurred while loading %s' % (ex, file_name))
+            self.report.append({'file': file_name, 'rows': 0, 'seconds': time.perf_counter() - start,
+                                'rows_per_second': 0.0, 'status': 'failed: %s' % ex})
+            return False
+        seconds = time.perf_counter() - start
+        self.report.append({'file': file_name, 'rows': rows, 'seconds': seconds,
+                            'rows_per_second': rows / seconds if seconds > 0 else 0.0, 'status': status})
+        return failed == 0
+
+    def print_report(self, total_seconds):
+        for entry in self.report:
+            print('%s : rows = %d, seconds = %.2f, rows/sec = %.1f, %s' % (
+                entry['file'], entry['rows'], entry['seconds'], entry['rows_per_second'], entry['status']))
+        total_rows = sum(entry['rows'] for entry in self.report)
+        print('total : files = %d, rows = %d, seconds = %.2f, rows/sec = %.1f' % (
+            len(self.report), total_rows, total_seconds, total_rows / total_seconds if total_seconds > 0 else 0.0))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('directory', help='directory of entity_* and rel-of-entity_* csv files')
+    parser.add_argument('--workers', type=int, default=Constants.WORKERS, help='number of files loaded at a time')
+    parser.add_argument('--resume', action='store_true',
+                        help='read the journals written by a previous (crashed) run of the same files, skip the '
+                             'chunks they committed and merge the relationships of the replayed ones')
+    args = parser.parse_args()
+    IngestionPlanner(args.directory, args.workers, args.resume).run()
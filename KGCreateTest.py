@@ -4,9 +4,14 @@ from neo4j import GraphDatabase
 from main import get_label, get_subject_predict_label, parse_relation
 import Constants
 import RemoteGraphConstruction
-from main import extract_data_from_csv
+from main import read_csv_rows
 from concurrent.futures import ThreadPoolExecutor
 from concurrent.futures import as_completed
+from ParallelIngestionEngine import ParallelIngestionEngine
+from AnswerKey import AnswerKey
+from AdaptiveBatcher import AdaptiveBatcher
+from neo4j.exceptions import ServiceUnavailable, TransientError
+from main import get_score
 
 
 class MyTestCase(unittest.TestCase):
@@ -19,7 +24,7 @@ class MyTestCase(unittest.TestCase):
         file_path = Constants.TEST_ENTITY_FILE
         file_name = os.path.basename(file_path).split(Constants.DOT)[0]
         file_name_split = file_name.split(Constants.UNDERSCORE)
-        entity_rows = extract_data_from_csv(file_path)
+        entity_rows = read_csv_rows(file_path)
         label = get_label(file_name_split)
         with GraphDatabase.driver(Constants.URI, auth=(Constants.USERNAME, Constants.PASSWORD)) as driver:
             with ThreadPoolExecutor(10) as executor:  # creating a pool of threads with size 10
@@ -34,7 +39,7 @@ class MyTestCase(unittest.TestCase):
         :return:
         """
         file_path = Constants.TEST_REL_FILE
-        entity_rows = extract_data_from_csv(file_path)
+        entity_rows = read_csv_rows(file_path)
         file_name = os.path.basename(file_path).split(Constants.DOT)[0]
         subject_label, predict_label = get_subject_predict_label(file_name)
         with GraphDatabase.driver(Constants.URI, auth=(Constants.USERNAME, Constants.PASSWORD)) as driver:
@@ -46,6 +51,116 @@ class MyTestCase(unittest.TestCase):
                 for future in as_completed(futures):
                     self.assertEqual(future.result(), True)
 
+    def test_parallel_entity_ingestion(self):
+        """
+        partitions the input rows by id across the writer pool of ParallelIngestionEngine and commits them in chunks.
+        :return:
+        """
+        file_path = Constants.TEST_ENTITY_FILE
+        file_name = os.path.basename(file_path).split(Constants.DOT)[0]
+        label = get_label(file_name.split(Constants.UNDERSCORE))
+        with GraphDatabase.driver(Constants.URI, auth=(Constants.USERNAME, Constants.PASSWORD)) as driver:
+            engine = ParallelIngestionEngine(driver, workers=10)
+            report = engine.ingest_entities(label, read_csv_rows(file_path))
+            self.assertEqual(report['failed'], 0)
+            self.assertEqual(report['written'] + report['skipped'], report['rows'])
+
+    def test_relation_partitions_are_disjoint(self):
+        """
+        no subject or predict node may be assigned to two writer partitions of ParallelIngestionEngine.
+        :return:
+        """
+        engine = ParallelIngestionEngine(None, workers=4)
+        assign = engine.get_relation_partitioner('Subject', 'Predict')
+        owners = {}
+        for subject in range(30):
+            for predict in range(0, 30, 7):
+                relation = {Constants.SUBJECT: str(subject), Constants.PREDICT: str((subject + predict) % 30)}
+                partition = assign(relation)
+                if partition is None:  # deferred until every worker is done
+                    continue
+                for node in (('Subject', relation[Constants.SUBJECT]), ('Predict', relation[Constants.PREDICT])):
+                    self.assertEqual(owners.setdefault(node, partition), partition)
+
+    def test_answer_key_score(self):
+        """
+        the compiled answer key must score exactly like get_score, including empty and duplicated options.
+        :return:
+        """
+        correct_options = ['Linked List', 'linked\tlist', '', None, 'Hash Map', ' ', 'tree']
+        answers = ['I would use a linked list', 'A HASH MAP and a tree', '', 'heap', 'linkedlist hashmap tree']
+        answer_key = AnswerKey(correct_options)
+        self.assertEqual(answer_key.score_all(answers), [get_score(answer, correct_options) for answer in answers])
+
+    def test_adaptive_batcher_bisects_bad_rows(self):
+        """
+        a row failing on its data is isolated and rejected, the other rows are committed, and only the chunks without
+        rejected rows are reported to on_chunk_committed.
+        :return:
+        """
+        batcher = AdaptiveBatcher(initial_size=4, max_size=4, target_seconds=60.0)
+        written = []
+        reported = []
+
+        def commit(chunk):
+            if 5 in chunk or 6 in chunk:
+                raise ValueError('bad row')
+            written.extend(chunk)
+
+        self.assertEqual(batcher.run(range(12), commit, lambda row_number, chunk: reported.append(row_number)), 10)
+        self.assertEqual([row for row, reason in batcher.rejected], [5, 6])
+        self.assertEqual(sorted(written), [0, 1, 2, 3, 4, 7, 8, 9, 10, 11])
+        self.assertEqual(reported, [0, 8])
+        self.assertEqual(batcher.chunk_size, 4)  # data errors do not shrink the chunks
+
+    def test_adaptive_batcher_resizes(self):
+        """
+        fast commits double the chunk size up to max_size, slow commits halve it down to min_size.
+        :return:
+        """
+        batcher = AdaptiveBatcher(initial_size=2, max_size=16, target_seconds=60.0)
+        sizes = []
+        batcher.run(range(100), lambda chunk: sizes.append(len(chunk)))
+        self.assertEqual(sizes[:4], [2, 4, 8, 16])
+        self.assertEqual(max(sizes), 16)
+        batcher = AdaptiveBatcher(initial_size=16, min_size=2, target_seconds=0.0)
+        sizes = []
+        batcher.run(range(40), lambda chunk: sizes.append(len(chunk)))
+        self.assertEqual(sizes[:4], [16, 8, 4, 2])
+        self.assertEqual(batcher.chunk_size, 2)
+
+    def test_adaptive_batcher_splits_on_transient_error(self):
+        """
+        a chunk too large for the server (TransientError) is split and retried at the smaller size; the run aborts when
+        min_size still fails or the server is unavailable.
+        :return:
+        """
+        batcher = AdaptiveBatcher(initial_size=1000, target_seconds=60.0)
+        reported = []
+
+        def commit(chunk):
+            if len(chunk) > 100:
+                raise TransientError('memory limit')
+
+        self.assertEqual(batcher.run(range(3000), commit, lambda row_number, chunk: reported.append(len(chunk))), 3000)
+        self.assertEqual(batcher.rejected, [])
+        self.assertLessEqual(batcher.chunk_size, 200)
+        self.assertEqual(sum(reported), 3000)
+
+        def fail(chunk):
+            raise TransientError('memory limit')
+
+        batcher = AdaptiveBatcher(initial_size=8, min_size=2)
+        self.assertRaises(TransientError, batcher.run, range(8), fail)
+        self.assertEqual(batcher.committed, 0)
+
+        def unavailable(chunk):
+            raise ServiceUnavailable('server down')
+
+        batcher = AdaptiveBatcher(initial_size=8)
+        self.assertRaises(ServiceUnavailable, batcher.run, range(8), unavailable)
+        self.assertEqual(batcher.chunk_size, 8)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,92 @@
+import csv
+import io
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import Constants
+
+QUOTE = b'"'
+
+
+def _read_record_end(csv_file, parity):
+    """
+    reads up to the end of the current csv record: a line end is only a record end when the number of quotes read so
+    far is even, i.e. the line end is not inside a quoted field.
+    :return: number of bytes read.
+    """
+    read = 0
+    while True:
+        line = csv_file.readline()
+        read += len(line)
+        parity ^= line.count(QUOTE) & 1
+        if not line or parity == 0:
+            return read
+
+
+def find_shard_boundaries(path, shard_size=Constants.SHARD_SIZE):
+    """
+    splits a csv file into byte ranges of roughly shard_size that start and end on record boundaries.
+    :return: header (bytes) and a list of (start, end) byte offsets, header excluded.
+    """
+    boundaries = []
+    with open(path, 'rb') as csv_file:
+        header_end = _read_record_end(csv_file, 0)
+        csv_file.seek(0)
+        header = csv_file.read(header_end)
+        start = header_end
+        position = header_end
+        parity = 0
+        while True:
+            block = csv_file.read(max(start + shard_size - position, 0))
+            position += len(block)
+            parity ^= block.count(QUOTE) & 1
+            position += _read_record_end(csv_file, parity)
+            parity = 0
+            if position == start:
+                return header, boundaries
+            boundaries.append((start, position))
+            start = position
+
+
+def _parse_shard(path, header, start, end, normalizer):
+    with open(path, 'rb') as csv_file:
+        csv_file.seek(start)
+        data = csv_file.read(end - start)
+    text = (header + data).decode('utf-8', errors='ignore')
+    return [normalizer(row) for row in csv.DictReader(io.StringIO(text, newline=''))]
+
+
+def parse_csv_in_parallel(path, normalizer, workers=None, shard_size=Constants.SHARD_SIZE, executor=None):
+    """
+    parses and normalizes a csv file in a ProcessPoolExecutor, one byte-range shard per task, and yields the
+    normalized records in file order. at most 2 * workers shards are parsed ahead of the consumer, so memory stays
+    bounded for files of any size.
+    :param path: path of the csv file.
+    :param normalizer: module-level function applied to every row (e.g. main.parse_relation, main.normalize_ticket).
+    :param workers: number of processes, os.cpu_count() by default.
+    :param shard_size: approximate size of one shard in bytes.
+    :param executor: optional ProcessPoolExecutor shared by several files (e.g. by the threads of IngestionPlanner);
+                     a pool of workers processes is started for the file when omitted.
+    """
+    header, boundaries = find_shard_boundaries(path, shard_size)
+    if len(boundaries) <= 1:  # not worth starting processes for a single shard
+        for start, end in boundaries:
+            yield from _parse_shard(path, header, start, end, normalizer)
+        return
+    workers = workers or os.cpu_count() or 1
+    if executor is not None:
+        yield from _parse_shards(executor, workers, path, header, boundaries, normalizer)
+        return
+    with ProcessPoolExecutor(workers) as executor:
+        yield from _parse_shards(executor, workers, path, header, boundaries, normalizer)
+
+
+def _parse_shards(executor, workers, path, header, boundaries, normalizer):
+    pending = deque()
+    for start, end in boundaries:
+        if len(pending) >= 2 * workers:
+            yield from pending.popleft().result()
+        pending.append(executor.submit(_parse_shard, path, header, start, end, normalizer))
+    while pending:
+        yield from pending.popleft().result()
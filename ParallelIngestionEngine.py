@@ -0,0 +1,173 @@
+import logging
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue
+
+import Constants
+from RemoteGraphConstruction import RemoteGraphConstruction
+from main import validate_relations, get_chunks
+
+
+class ParallelIngestionEngine:
+    """
+    Ingests rows with a pool of writer threads. Rows are partitioned so two workers never write the same node: entities
+    by a hash of their id, relations by the owner of their endpoints (see get_relation_partitioner), and every worker keeps one long-lived session and commits one transaction per chunk. Each worker has
+    a bounded queue of chunks: when the writers fall behind, the reader blocks instead of buffering the whole file.
+    """
+
+    def __init__(self, graph_db_driver, workers=Constants.WORKERS, chunk_size=Constants.BATCH_SIZE,
+                 queue_size=Constants.QUEUE_SIZE):
+        """
+        :param graph_db_driver: fully configured remote/local database connection
+        :param workers: number of writer threads (and partitions).
+        :param chunk_size: number of rows committed per transaction.
+        :param queue_size: number of chunks that may wait for each writer before the reader blocks.
+        """
+        self.graph_db_driver = graph_db_driver
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.queue_size = queue_size
+
+    def ingest_entities(self, entity_name, entity_rows):
+        """
+        :param entity_name: node label name
+        :param entity_rows: rows (any iterable, e.g. read_csv_rows) that needs to be inserted in database.
+        :return: throughput report, see _run.
+        """
+        return self._run(entity_rows, lambda entity: self.partition(entity[Constants.ID]),
+                         RemoteGraphConstruction._merge_entity_chunk_tx, entity_name)
+
+    def ingest_relations(self, subject_label, predict_label, relation_rows):
+        """
+        rows are validated by the reader (see main.validate_relations) and partitioned by their subject and predict
+        nodes (see get_relation_partitioner).
+        :param subject_label: label name of the subject node
+        :param predict_label: label name of the predict/object node.
+        :param relation_rows: raw relation rows (any iterable, e.g. read_csv_rows).
+        :return: throughput report, see _run. invalid rows are counted as failed.
+        """
+        invalid = [0]
+
+        def valid_relations():
+            for relation, is_valid in validate_relations(relation_rows, subject_label, predict_label):
+                if is_valid:
+                    yield relation
+                else:
+                    invalid[0] += 1
+
+        report = self._run(valid_relations(), self.get_relation_partitioner(subject_label, predict_label),
+                           RemoteGraphConstruction._create_relation_chunk_tx, subject_label, predict_label)
+        report['rows'] += invalid[0]
+        report['failed'] += invalid[0]
+        return report
+
+    def partition(self, key):
+        return zlib.crc32(str(key).encode()) % self.workers
+
+    def get_relation_partitioner(self, subject_label, predict_label):
+        """
+        a node belongs to the worker of the first relation that touches it, and every later relation of the node goes
+        to the same worker, so the endpoints of the relations of two workers never overlap (the streamed equivalent of
+        union-find buckets over subject and predict ids). a relation whose endpoints already belong to two different
+        workers cannot go to either of them: it is deferred until the workers are done.
+        :return: function(relation) returning the partition of the relation, or None if it is deferred.
+        """
+        owners = {}  # {(label, node id): partition}
+
+        def assign(relation):
+            subject = (subject_label, relation[Constants.SUBJECT])
+            predict = (predict_label, relation[Constants.PREDICT])
+            subject_owner = owners.get(subject)
+            predict_owner = owners.get(predict)
+            if subject_owner is None and predict_owner is None:
+                partition = self.partition(relation[Constants.SUBJECT])
+            elif subject_owner is None or predict_owner is None or subject_owner == predict_owner:
+                partition = subject_owner if subject_owner is not None else predict_owner
+            else:
+                return None
+            owners[subject] = partition
+            owners[predict] = partition
+            return partition
+
+        return assign
+
+    def _run(self, rows, assign, write_tx, *args):
+        """
+        :param assign: function(row) returning the partition of the row, or None to write it after every worker is
+                       done, on its own.
+        :return: {'rows', 'written', 'skipped', 'failed', 'seconds', 'rows_per_second'}
+        """
+        queues = [Queue(maxsize=self.queue_size) for _ in range(self.workers)]
+        pending = [[] for _ in range(self.workers)]
+        deferred = []
+        total = 0
+        start = time.perf_counter()
+        with ThreadPoolExecutor(self.workers) as executor:
+            futures = [executor.submit(self._write_partition, partition_queue, write_tx, *args) for partition_queue in
+                       queues]
+            try:
+                for row in rows:
+                    total += 1
+                    partition = assign(row)
+                    if partition is None:
+                        deferred.append(row)
+                        continue
+                    pending[partition].append(row)
+                    if len(pending[partition]) >= self.chunk_size:
+                        queues[partition].put(pending[partition])  # blocks while the writer is behind
+                        pending[partition] = []
+            finally:
+                for partition, partition_queue in enumerate(queues):
+                    if pending[partition]:
+                        partition_queue.put(pending[partition])
+                    partition_queue.put(None)
+            written = 0
+            failed = 0
+            for future in futures:
+                worker_written, worker_failed = future.result()
+                written += worker_written
+                failed += worker_failed
+        if deferred:  # no other writer is running any more
+            deferred_queue = Queue()
+            for chunk in get_chunks(deferred, self.chunk_size):
+                deferred_queue.put(chunk)
+            deferred_queue.put(None)
+            deferred_written, deferred_failed = self._write_partition(deferred_queue, write_tx, *args)
+            written += deferred_written
+            failed += deferred_failed
+        seconds = time.perf_counter() - start
+        report = {'rows': total, 'written': written, 'skipped': total - written - failed, 'failed': failed,
+                  'seconds': seconds,
+                  'rows_per_second': total / seconds if seconds > 0 else 0.0}
+        logging.info('ingestion report : %s' % report)
+        return report
+
+    def _write_partition(self, partition_queue, write_tx, *args):
+        """
+        writer loop of one worker: commits every chunk of its partition in its own transaction on one session.
+        :return: (written, failed)
+        """
+        written = 0
+        failed = 0
+        session = None
+        try:
+            session = self.graph_db_driver.session(database='neo4j')
+        except Exception as ex:
+            logging.exception('exception, %s, occurred while opening a session' % ex)
+        try:
+            while True:
+                chunk = partition_queue.get()
+                if chunk is None:
+                    return written, failed
+                if session is None:
+                    failed += len(chunk)
+                    continue
+                try:
+                    written += session.execute_write(write_tx, *args, chunk)
+                except Exception as ex:
+                    logging.exception('exception, %s, occurred while writing a chunk' % ex)
+                    failed += len(chunk)
+        finally:
+            if session is not None:
+                session.close()
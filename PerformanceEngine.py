@@ -0,0 +1,155 @@
+import logging
+from itertools import islice
+from threading import Lock
+
+import numpy as np
+
+import Constants
+import CypherTemplates
+from GraphRepo import GraphRepo
+
+
+class PerformanceEngine:
+    """
+    Performance of students as computed by main.measure_student_performance: for every type of
+    Constants.SCORING_SCHEMA, the sum of the student's submission scores over the sum of the assessment points, times
+    the weight of the type (x 100). the point totals do not depend on the student, so they are fetched once and cached
+    until invalidate is called (assessment types or points changed); the scores of every student come from one grouped
+    query, and the weights are applied column-wise.
+    the performance and the score_<type> sums are also materialized on every Student node (refresh_students,
+    refresh_assessments), so reading the performance is a property fetch.
+    """
+    TYPES = list(Constants.SCORING_SCHEMA.keys())
+    WEIGHTS = np.array([Constants.SCORING_SCHEMA[schema_type] * 100 for schema_type in TYPES], dtype=float)
+    _assessment_points = None
+    _lock = Lock()
+
+    @classmethod
+    def invalidate(cls):
+        with cls._lock:
+            cls._assessment_points = None
+
+    @classmethod
+    def get_assessment_points(cls):
+        """
+        :return: array of the total assessment points of every type, in the order of TYPES.
+        """
+        with cls._lock:
+            if cls._assessment_points is None:
+                records, summary, keys = GraphRepo.execute_query(CypherTemplates.assessment_points_by_type(),
+                                                                 {'types': cls.TYPES})
+                points = np.zeros(len(cls.TYPES))
+                for record in records:
+                    points[cls.TYPES.index(record['type'])] = record['points'] or 0.0
+                cls._assessment_points = points
+            return cls._assessment_points
+
+    @classmethod
+    def get_student_scores(cls, student_ids=None):
+        """
+        :param student_ids: ids of the students, or None for every student.
+        :return: student ids and a (students x TYPES) array of their score sums.
+        """
+        parameters = {'types': cls.TYPES}
+        if student_ids is not None:
+            parameters['student_ids'] = list(student_ids)
+        records, summary, keys = GraphRepo.execute_query(
+            CypherTemplates.student_scores_by_type(student_ids is not None), parameters)
+        rows = {}  # {student id: row index}
+        scores = np.zeros((len(records), len(cls.TYPES)))
+        for record in records:
+            row = rows.setdefault(record['student_id'], len(rows))
+            if record['type'] is not None:
+                scores[row, cls.TYPES.index(record['type'])] = record['score'] or 0.0
+        return list(rows), scores[:len(rows)]
+
+    @classmethod
+    def compute_performances(cls, scores):
+        points = cls.get_assessment_points()
+        ratios = np.divide(scores, points, out=np.zeros_like(scores), where=points != 0.0)
+        return ratios @ cls.WEIGHTS
+
+    @classmethod
+    def measure_performances(cls, student_ids=None):
+        """
+        :param student_ids: ids of the students, or None for every student.
+        :return: {student id: performance} of the students, computed from their submissions.
+        """
+        students, scores = cls.get_student_scores(student_ids)
+        return dict(zip(students, cls.compute_performances(scores).tolist()))
+
+    @classmethod
+    def measure_performance(cls, student):
+        students, scores = cls.get_student_scores([student])
+        if not students:
+            return 0.0
+        return float(cls.compute_performances(scores).sum())
+
+    @classmethod
+    def get_performances(cls):
+        """
+        :return: {student id: performance} of every student, read from the performance property of the students
+                 (see refresh_students); the students not refreshed yet are measured from their submissions.
+        """
+        try:
+            records, summary, keys = GraphRepo.execute_query(CypherTemplates.student_performances())
+            performances = {record['student_id']: record['performance'] for record in records}
+            missing = [student_id for student_id, performance in performances.items() if performance is None]
+            if missing:
+                performances.update(cls.measure_performances(missing))
+            return performances
+        except Exception as ex:
+            logging.exception("exception, %s, occurred while measuring the performance of the students" % ex)
+            return {}
+
+    @classmethod
+    def get_performance(cls, student):
+        records, summary, keys = GraphRepo.execute_query(CypherTemplates.student_performances(True),
+                                                         {'student_id': student})
+        for record in records:
+            if record['performance'] is not None:
+                return record['performance']
+        return cls.measure_performance(student)
+
+    @classmethod
+    def get_refresh_parameters(cls):
+        return {'types': cls.TYPES, 'totals': cls.get_assessment_points().tolist(), 'weights': cls.WEIGHTS.tolist()}
+
+    @classmethod
+    def refresh_students(cls, student_ids, chunk_size=Constants.BATCH_SIZE):
+        """
+        recomputes the score_<type> sums and the performance stored on the given students, after their submissions
+        were written.
+        :return: number of students refreshed.
+        """
+        query = CypherTemplates.refresh_student_scores(tuple(cls.TYPES))
+        parameters = cls.get_refresh_parameters()
+        student_ids = iter(student_ids)
+        refreshed = 0
+        while True:
+            chunk = list(islice(student_ids, chunk_size))
+            if not chunk:
+                return refreshed
+            try:
+                records, summary, keys = GraphRepo.execute_query(query, dict(parameters, student_ids=chunk))
+                refreshed += records[0]['refreshed']
+            except Exception as ex:
+                logging.exception("exception, %s, occurred while refreshing the performance of students" % ex)
+
+    @classmethod
+    def refresh_assessments(cls, assessment_ids):
+        """
+        after the type or points of assessments changed: the score sums of the students who submitted them are
+        recomputed, and those of the students never refreshed are computed, then the performance of every student is
+        recomputed from the stored sums, since the point totals by type changed.
+        """
+        cls.invalidate()
+        parameters = cls.get_refresh_parameters()
+        try:
+            GraphRepo.execute_query(CypherTemplates.refresh_student_scores(tuple(cls.TYPES), True),
+                                    dict(parameters, assessment_ids=list(assessment_ids)))
+            GraphRepo.execute_query(CypherTemplates.refresh_student_scores(tuple(cls.TYPES), missing_scores=True),
+                                    parameters)
+            GraphRepo.execute_query(CypherTemplates.refresh_performances(), parameters)
+        except Exception as ex:
+            logging.exception("exception, %s, occurred while refreshing the performance of students" % ex)
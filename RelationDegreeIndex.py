@@ -0,0 +1,75 @@
+from collections import Counter
+
+import Constants
+import CypherTemplates
+from GraphRepo import GraphRepo
+
+
+class RelationDegreeIndex:
+    """
+    In-memory out/in degree of every node, keyed by (relation name, node id), for one subject/predict label pair.
+    Each relation name is seeded from the graph with one aggregate query and then updated as rows are accepted, so
+    FUNCTIONAL and INVERSE_FUNCTIONAL checks are O(1) per row and also see rows of the same uncommitted batch.
+    """
+
+    def __init__(self, subject_label, predict_label):
+        self.subject_label = subject_label
+        self.predict_label = predict_label
+        self.out_degree = Counter()  # {(relation name, subject id): number of outgoing edges}
+        self.in_degree = Counter()  # {(relation name, predict id): number of incoming edges}
+        self.seeded_relations = set()
+
+    def seed(self, relation_name, tx=None):
+        """
+        :param relation_name: name of the relationship type.
+        :param tx: optional open transaction; the graph is read through GraphRepo when omitted.
+        """
+        if relation_name in self.seeded_relations:
+            return
+        query = CypherTemplates.relation_degrees(self.subject_label, self.predict_label, relation_name)
+        if tx is None:
+            records, summary, keys = GraphRepo.execute_query(query)
+            record = records[0]
+        else:
+            record = tx.run(query).single()
+        self.seed_from_record(relation_name, record)
+
+    def seed_from_record(self, relation_name, record):
+        """
+        seeds the relation name from an already fetched CypherTemplates.relation_degrees record (e.g. by an async
+        transaction).
+        """
+        for subject_id in record['subjects']:
+            self.out_degree[(relation_name, subject_id)] += 1
+        for predict_id in record['predicts']:
+            self.in_degree[(relation_name, predict_id)] += 1
+        self.seeded_relations.add(relation_name)
+
+    def is_functional_satisfied(self, relation, tx=None):
+        """
+        :param relation: parsed relation (see main.parse_relation).
+        :param tx: optional open transaction used to seed the relation name.
+        :return: True, if adding the relation keeps its FUNCTIONAL and INVERSE_FUNCTIONAL characteristics.
+        """
+        relation_name = relation[Constants.NAME]
+        self.seed(relation_name, tx)
+        if relation.get(Constants.FUNCTIONAL) == '1' and self.out_degree[
+                (relation_name, relation[Constants.SUBJECT])] > 0:
+            return False
+        if relation.get(Constants.INVERSE_FUNCTIONAL) == '1' and self.in_degree[
+                (relation_name, relation[Constants.PREDICT])] > 0:
+            return False
+        return True
+
+    def add(self, relation):
+        relation_name = relation[Constants.NAME]
+        self.out_degree[(relation_name, relation[Constants.SUBJECT])] += 1
+        self.in_degree[(relation_name, relation[Constants.PREDICT])] += 1
+
+    def remove(self, relation):
+        """
+        undoes add, for a relation whose write failed.
+        """
+        relation_name = relation[Constants.NAME]
+        self.out_degree[(relation_name, relation[Constants.SUBJECT])] -= 1
+        self.in_degree[(relation_name, relation[Constants.PREDICT])] -= 1
@@ -1,9 +1,13 @@
+import argparse
 import os
 
 from neo4j import GraphDatabase
 
-from main import check_relationship, extract_data_from_csv, get_label, create_relationship_query
-from cymple import QueryBuilder
+from main import read_csv_rows, get_label, create_relationship_query, group_relations_by_name
+from IngestionJournal import IngestionJournal
+from AdaptiveBatcher import AdaptiveBatcher
+import CypherTemplates
+from RelationDegreeIndex import RelationDegreeIndex
 import logging
 import Constants
 
@@ -37,17 +41,11 @@ class RemoteGraphConstruction:
         :param entity: key-value map (properties of node).
         :return: True, if node creation is successful.
         """
-        qb = QueryBuilder()
-        id_match_query = qb.match().node(labels=entity_name, ref_name='n',
-                                         properties={Constants.ID: str(entity[Constants.ID])}).return_literal(
-            'n')
-        result = tx.run(id_match_query)
+        result = tx.run(CypherTemplates.node_exists(entity_name), {Constants.ID: str(entity[Constants.ID])})
         record = result.single()
         if record is not None:
             raise Exception("Node ID with given label is already exists in database")
-        create_node_query = qb.create().node(labels=entity_name, ref_name='n', properties=entity).return_literal(
-            'n')
-        result = tx.run(create_node_query)
+        result = tx.run(CypherTemplates.create_node(entity_name), {'props': entity})
         record = result.single()
         if record is not None:
             return True
@@ -93,79 +91,124 @@ class RemoteGraphConstruction:
         :param relation: properties of the relation
         :return: True, if relationship creation is successful
         """
-        is_valid = check_relationship(relation, subject_label,
-                                      predict_label)  # validates existence of subject and predict in the database and  satisfiability of characteristic
-        if not is_valid:
-            raise Exception('RelationCannotBeFormed')
-        try:
-            create_relation_query = create_relationship_query(subject_label, predict_label,
-                                                              relation)  # this helper function builds the query for inserting relationship
-            tx.run(create_relation_query)
-            return True
-        except Exception as ex:
-            logging.exception('exception, %s, occurred while creating relationship' % ex)
-            return False
+        RemoteGraphConstruction._insert_relation_batch_tx(tx, subject_label, predict_label,
+                                                          [relation])  # existence and characteristics checked in tx
+        return True
 
-    def insert_entity_batch(self, graph_db_driver, entity_name, entity_rows):
+    def insert_entity_batch(self, graph_db_driver, entity_name, entity_rows, journal=None, batcher=None):
+        """
+         performs batch insertion, one transaction per chunk whose size is adapted to the commit latency (see
+         AdaptiveBatcher). nodes are merged on id, so replaying a chunk is idempotent, and a failing chunk is bisected
+         so that only the offending rows are left out.
+        :param graph_db_driver: fully configured remote/local database connection
+        :param entity_name: node label name
+        :param entity_rows: rows (any iterable, e.g. read_csv_rows) that needs to be inserted in database.
+        :param journal: optional IngestionJournal; committed chunks are recorded and, when resuming, skipped.
+        :param batcher: optional AdaptiveBatcher, to configure the chunk sizes or read the rejected rows.
+        :return: True, if every row was committed.
+        """
+        batcher = batcher or AdaptiveBatcher()
         try:
             with graph_db_driver.session(database='neo4j') as session:  # a session is lightweight operation.
-                self._insert_batch_entity_tx(session, entity_name, entity_rows)
-                return True
+                row_number = 0
+                if journal is not None:
+                    row_number, entity_rows = journal.skip_committed(entity_rows)
+                batcher.run(entity_rows,
+                            lambda chunk: session.execute_write(self._merge_entity_chunk_tx, entity_name, chunk),
+                            journal.record if journal is not None else None, row_number)
+                return len(batcher.rejected) == 0
         except Exception as ex:
             logging.exception('exception, %s, occurred while creating node' % ex)
             return False
 
-    @staticmethod
-    def _insert_batch_entity_tx(session, entity_name, entity_rows):
+    def insert_relation_batch(self, graph_db_driver, subject_label, predict_label, relation_rows, batcher=None):
         """
-         performs batch insertion. if something goes wrong while insertion at any point, every successful insertion prior to the failure will roll back.
-        :param session: driver session
-        :param entity_name: node label name
-        :param entity_rows: set of rows that needs to be inserted in database.
-        :return:
+         performs batch insertion of parsed relations, one transaction per adaptive chunk (see AdaptiveBatcher). a
+         chunk holding an invalid relation is bisected, so the valid relations are still committed.
+        :param graph_db_driver: fully configured remote/local database connection
+        :param subject_label: label name of the subject node
+        :param predict_label: label name of the predict/object node.
+        :param relation_rows: parsed relations that needs to be inserted in database.
+        :param batcher: optional AdaptiveBatcher, to configure the chunk sizes or read the rejected relations.
+        :return: True, if every relation was committed.
         """
-        with session.begin_transaction() as tx:
-            for entity in entity_rows:
-                qb = QueryBuilder()
-                id_match_query = qb.match().node(labels=entity_name, ref_name='n',
-                                                 properties={Constants.ID: str(entity[Constants.ID])}).return_literal(
-                    'n')
-                result = tx.run(id_match_query)
-                record = result.single()
-                if record is not None:
-                    raise Exception("Node ID with given label is already exists in database")
-                create_node_query = qb.create().node(labels=entity_name, ref_name='n',
-                                                     properties=entity).return_literal('n')
-                tx.run(create_node_query)
-
-    def insert_relation_batch(self, graph_db_driver, subject_label, predict_label, relation_rows):
+        batcher = batcher or AdaptiveBatcher()
         try:
             with graph_db_driver.session(database='neo4j') as session:
-                self._insert_relation_batch_tx(session, subject_label, predict_label, relation_rows)
-                return True
+                batcher.run(relation_rows,
+                            lambda chunk: session.execute_write(self._insert_relation_batch_tx, subject_label,
+                                                                predict_label, chunk))
+                return len(batcher.rejected) == 0
         except Exception as ex:
             logging.exception('exception, %s, occurred while creating relationship' % ex)
             return False
 
     @staticmethod
-    def _insert_relation_batch_tx(session, subject_label, predict_label, relation_rows):
-        with session.begin_transaction() as tx:
-            for relation in relation_rows:
-                is_valid = check_relationship(relation, subject_label,
-                                              predict_label)
-                if not is_valid:
-                    raise Exception('relation cannot be formed')
-                create_relation_query = create_relationship_query(subject_label, predict_label,
-                                                                  relation)  # function that builds the query for inserting a relationship
-                tx.run(create_relation_query)
+    def _insert_relation_batch_tx(tx, subject_label, predict_label, relation_rows):
+        """
+         inserts a chunk of relations. functional characteristics are validated against a degree index that also
+         tracks the relations inserted earlier in the same (uncommitted) transaction.
+        :param tx: transaction
+        :param subject_label: label name of the subject node
+        :param predict_label: label name of the predict/object node.
+        :param relation_rows: parsed relations that needs to be inserted in database.
+        :return:
+        """
+        degree_index = RelationDegreeIndex(subject_label, predict_label)
+        for relation in relation_rows:
+            if tx.run(CypherTemplates.node_exists(subject_label),
+                      {Constants.ID: relation[Constants.SUBJECT]}).single() is None:
+                raise Exception('relation cannot be formed: subject %s does not exist' % relation[Constants.SUBJECT])
+            if tx.run(CypherTemplates.node_exists(predict_label),
+                      {Constants.ID: relation[Constants.PREDICT]}).single() is None:
+                raise Exception('relation cannot be formed: predict %s does not exist' % relation[Constants.PREDICT])
+            if not degree_index.is_functional_satisfied(relation, tx):
+                raise Exception('relation cannot be formed: functional characteristic violated')
+            degree_index.add(relation)
+            create_relation_query, parameters = create_relationship_query(subject_label, predict_label,
+                                                                          relation)  # function that builds the query for inserting a relationship
+            tx.run(create_relation_query, parameters)
+
+    @staticmethod
+    def _merge_entity_chunk_tx(tx, entity_name, entity_rows):
+        """
+        idempotent chunk insertion: nodes are merged on id, so existing nodes are skipped instead of failing the chunk.
+        :param tx: transaction
+        :param entity_name: node label name
+        :param entity_rows: chunk of rows that needs to be inserted in database.
+        :return: number of nodes created.
+        """
+        result = tx.run(CypherTemplates.merge_nodes(entity_name), {'rows': entity_rows})
+        return result.consume().counters.nodes_created
+
+    @staticmethod
+    def _create_relation_chunk_tx(tx, subject_label, predict_label, relation_rows):
+        """
+        :param tx: transaction
+        :param subject_label: label name of the subject node
+        :param predict_label: label name of the predict/object node.
+        :param relation_rows: chunk of parsed relations, already validated (see main.validate_relations).
+        :return: number of relationships created.
+        """
+        created = 0
+        for relation_name, rows in group_relations_by_name(relation_rows).items():
+            result = tx.run(CypherTemplates.create_relationships(subject_label, predict_label, relation_name),
+                            {'rows': rows})
+            created += result.consume().counters.relationships_created
+        return created
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--resume', action='store_true',
+                        help='read the journal written by a previous (crashed) run of the same file and skip the '
+                             'chunks it committed')
+    args = parser.parse_args()
     remote_graph = RemoteGraphConstruction()
     file_path = Constants.TEST_ENTITY_FILE
     file_name = os.path.basename(file_path).split(Constants.DOT)[0]
     file_name_split = file_name.split(Constants.UNDERSCORE)
-    entity_rows = extract_data_from_csv(file_path)
+    entity_rows = read_csv_rows(file_path)
     label = get_label(file_name_split)
     with GraphDatabase.driver(Constants.URI, auth=(Constants.USERNAME, Constants.PASSWORD)) as driver:
-        remote_graph.insert_entity_batch(driver, label, entity_rows)
+        remote_graph.insert_entity_batch(driver, label, entity_rows, IngestionJournal(file_path, args.resume))
@@ -0,0 +1,92 @@
+import logging
+
+import Constants
+from CypherTemplates import escape_name
+from GraphRepo import GraphRepo
+
+
+class SchemaManager:
+    """
+    Creates the uniqueness constraints and indexes behind every MATCH (n:Label {property: ...}) lookup of the project,
+    so lookups are index seeks instead of label scans. every statement uses IF NOT EXISTS, so bootstrapping is
+    idempotent and can run before each ingestion.
+    """
+    # (label, property, unique, lookups relying on it)
+    DOMAIN_SCHEMA = [
+        (Constants.STUDENT, Constants.ID, True, 'learn gain, submission and performance matches'),
+        (Constants.STUDENT, Constants.NAME, False, 'get_id_by_name'),
+        (Constants.COURSE_INSTANCE, Constants.ID, True, 'course instance matches'),
+        (Constants.ASSESSMENT, Constants.ID, True, 'submission and assessment matches'),
+        (Constants.ASSESSMENT, Constants.TYPE, False, 'get_assessment_scores_by_type'),
+        (Constants.QUESTION, Constants.ID, False, 'question matches'),  # quiz and ticket questions share the label
+        (Constants.KNOWLEDGE_TICKET_LABEL, Constants.ID, True, 'ticket matches'),
+        (Constants.Session, Constants.ID, True, 'session matches'),
+        (Constants.LEARNING_OUTCOME, Constants.ID, True, 'outcome matches'),
+        (Constants.SUBMISSION, Constants.ID, False, 'submission matches'),
+        (Constants.LEARN_GAIN, Constants.ENTRY_ID, False, 'get_student_learn_gain, get_session_learn_gains'),
+        (Constants.LEARN_GAIN_STATS, Constants.STATS_SESSION_ID, False, 'get_learn_gain_stats'),
+    ]
+
+    @classmethod
+    def get_required_schema(cls, entity_labels=()):
+        """
+        :param entity_labels: labels of entity files (see main.get_labels_from_directory); their id must be unique.
+        :return: list of (label, property, unique, lookups relying on it).
+        """
+        schema = list(cls.DOMAIN_SCHEMA)
+        known = {(label, prop) for label, prop, unique, used_by in schema}
+        for label in entity_labels:
+            if (label, Constants.ID) not in known:
+                schema.append((label, Constants.ID, True, 'is_id_exists, create_relationship_query'))
+                known.add((label, Constants.ID))
+        return schema
+
+    @classmethod
+    def ensure_schema(cls, entity_labels=()):
+        """
+        creates the missing constraints and indexes. a uniqueness constraint that cannot be created (e.g. the label
+        already holds duplicate ids) falls back to a plain index.
+        :return: list of (label, property, 'constraint' | 'index' | 'failed').
+        """
+        applied = []
+        for label, prop, unique, used_by in cls.get_required_schema(entity_labels):
+            if unique:
+                try:
+                    GraphRepo.execute_query(cls._constraint_statement(label, prop))
+                    applied.append((label, prop, 'constraint'))
+                    continue
+                except Exception as ex:
+                    logging.warning('uniqueness constraint on %s.%s not created (%s), creating an index instead' % (
+                        label, prop, ex))
+            try:
+                GraphRepo.execute_query(cls._index_statement(label, prop))
+                applied.append((label, prop, 'index'))
+            except Exception as ex:
+                logging.exception('exception, %s, occurred while creating index on %s.%s' % (ex, label, prop))
+                applied.append((label, prop, 'failed'))
+        return applied
+
+    @classmethod
+    def check_schema(cls, entity_labels=()):
+        """
+        :return: list of (label, property, lookups relying on it) that have no index behind them.
+        """
+        records, summary, keys = GraphRepo.execute_query(
+            "SHOW INDEXES YIELD labelsOrTypes, properties, entityType WHERE entityType = 'NODE' "
+            "RETURN labelsOrTypes, properties")
+        indexed = set()
+        for record in records:
+            if record['labelsOrTypes'] and record['properties']:
+                indexed.add((record['labelsOrTypes'][0], record['properties'][0]))  # leading property serves seeks
+        return [(label, prop, used_by) for label, prop, unique, used_by in cls.get_required_schema(entity_labels) if
+                (label, prop) not in indexed]
+
+    @staticmethod
+    def _constraint_statement(label, prop):
+        return 'CREATE CONSTRAINT %s IF NOT EXISTS FOR (n:%s) REQUIRE n.%s IS UNIQUE' % (
+            escape_name(label + '_' + prop + '_unique'), escape_name(label), escape_name(prop))
+
+    @staticmethod
+    def _index_statement(label, prop):
+        return 'CREATE INDEX %s IF NOT EXISTS FOR (n:%s) ON (n.%s)' % (
+            escape_name(label + '_' + prop + '_index'), escape_name(label), escape_name(prop))
@@ -0,0 +1,95 @@
+import csv
+import logging
+import math
+
+import numpy as np
+
+import Constants
+import CypherTemplates
+from GraphRepo import GraphRepo
+
+
+class SessionFeedback:
+    """
+    Feedback tiers of every student of a session at once. all (student id, learn gain) pairs are fetched with one
+    query and classified against the Learn_Gain_Stats of the session, as main.get_feedback does for one student:
+    mean + 3, 2 and 1 standard deviations, and mean - 3 standard deviations, giving feedback_one to feedback_five.
+    """
+    TIERS = ['feedback_one', 'feedback_two', 'feedback_three', 'feedback_four']
+    DEFAULT_TIER = 'feedback_five'
+
+    @classmethod
+    def get_learn_gains(cls, course_id, session_id):
+        """
+        :return: student ids and their learn gains, the gains counted in the stats of the session; a student with
+                 several learn gains for the session keeps the first one, as in main.get_student_learn_gain.
+        """
+        records, summary, keys = GraphRepo.execute_query(CypherTemplates.session_student_learn_gains(),
+                                                         {'course_id': course_id, 'session_id': session_id})
+        return [record['student_id'] for record in records], np.array([record['gain'] for record in records],
+                                                                      dtype=float)
+
+    @classmethod
+    def get_stats(cls, course_id, session_id):
+        """
+        MATCH (stats:Learn_Gain_Stats {course_id: <course_id>, session_id: <session_id>})
+        RETURN stats.count, stats.mean, stats.m2
+        the stats are kept up to date by the statements creating learn gains (see
+        CypherTemplates.update_learn_gain_stats); a session without stats yet is backfilled from all its learn
+        gains, older ones without course_id included (see CypherTemplates.backfill_learn_gain_stats).
+        :return: {'count', 'mean', 'm2'}, or None if the session has no learn gain.
+        """
+        parameters = {'course_id': course_id, 'session_id': session_id}
+        try:
+            records, summary, keys = GraphRepo.execute_query(CypherTemplates.learn_gain_stats(), parameters)
+            if not records:
+                records, summary, keys = GraphRepo.execute_query(CypherTemplates.backfill_learn_gain_stats(),
+                                                                 parameters)
+            for record in records:
+                return {'count': record['count'], 'mean': record['mean'], 'm2': record['m2']}
+        except Exception as ex:
+            logging.exception("An error, %s, occurred while reading the learn gain stats." % ex)
+        return None
+
+    @staticmethod
+    def get_mean_and_standard_deviation(stats):
+        """
+        :return: mean and sample standard deviation of the stats; the stats must hold at least two learn gains.
+        """
+        return stats['mean'], math.sqrt(stats['m2'] / (stats['count'] - 1))
+
+    @classmethod
+    def classify(cls, gains, mean, standard_deviation):
+        """
+        :param gains: a learn gain or an array of learn gains.
+        :return: the feedback tier of every gain, in an array of the same shape.
+        """
+        conditions = [gains > mean + (3 * standard_deviation), gains > mean + (2 * standard_deviation),
+                      gains > mean + standard_deviation, gains > mean - (3 * standard_deviation)]
+        return np.select(conditions, cls.TIERS, default=cls.DEFAULT_TIER)
+
+    @classmethod
+    def get_feedback(cls, course_id, session_id):
+        """
+        :return: {student id: feedback tier}, empty if the session has less than two learn gains.
+        """
+        stats = cls.get_stats(course_id, session_id)
+        if stats is None or stats['count'] < 2:
+            return {}
+        try:
+            student_ids, gains = cls.get_learn_gains(course_id, session_id)
+        except Exception as ex:
+            logging.exception("exception, %s, occurred while reading the learn gains of the session" % ex)
+            return {}
+        tiers = cls.classify(gains, *cls.get_mean_and_standard_deviation(stats))
+        feedback = {}
+        for student_id, tier in zip(student_ids, tiers.tolist()):
+            feedback.setdefault(student_id, tier)
+        return feedback
+
+    @classmethod
+    def write_csv(cls, feedback, path):
+        with open(path, Constants.WRITE, newline='') as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(['student_id', 'feedback'])
+            writer.writerows(feedback.items())
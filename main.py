@@ -1,35 +1,47 @@
 # This is a sample Python script.
+import argparse
 from threading import Lock
-import statistics
 import Constants
 import csv
 from cymple import QueryBuilder
 import os
 import logging
-import re
+from itertools import islice
 from GraphRepo import GraphRepo
-import matplotlib.pyplot as plt
+import CypherTemplates
+from RelationDegreeIndex import RelationDegreeIndex
+from ParallelCsvParser import parse_csv_in_parallel
+from IngestionJournal import IngestionJournal
+from SchemaManager import SchemaManager
+from CohortGain import CohortGain
+from AnswerKey import AnswerKey, normalize_answer
+from SessionFeedback import SessionFeedback
+from PerformanceEngine import PerformanceEngine
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+
+def read_csv_rows(path):
+    """
+    yields the rows of a csv file one at a time, so memory does not grow with the size of the file.
+    """
+    with open(path, newline='', errors='ignore') as csv_file:
+        for row in csv.DictReader(csv_file):
+            yield row
 
 
-def quote_value(value):
-    return "'" + value + "'"
+def read_csv_chunks(path, chunk_size=Constants.BATCH_SIZE):
+    return get_chunks(read_csv_rows(path), chunk_size)
 
 
 def extract_data_from_csv(path):
-    rows = []
-    with open(path, newline='', errors='ignore') as csv_file:
-        data = csv.DictReader(csv_file)
-        for row in data:
-            rows.append(row)
-    return rows
+    return list(read_csv_rows(path))
 
 
 def is_id_exists(node_id, node_label):
-    qb = QueryBuilder()
-    query = qb.match().node(labels=node_label, ref_name='n', properties={Constants.ID: str(node_id)}).return_literal(
-        'n')
     try:
-        records, summary, keys = GraphRepo.execute_query(query)
+        records, summary, keys = GraphRepo.execute_query(CypherTemplates.node_exists(node_label),
+                                                         {Constants.ID: str(node_id)})
         return len(records) > 0
     except Exception as ex:
         logging.exception("exception, %s, occurred while checking the existence of node" % ex)
@@ -37,10 +49,8 @@ def is_id_exists(node_id, node_label):
 
 def create_single_node(node_label, props):
     if not is_id_exists(props[Constants.ID], node_label):
-        qb = QueryBuilder()
-        query = qb.create().node(labels=node_label, properties=props)
         try:
-            GraphRepo.execute_query(query)
+            GraphRepo.execute_query(CypherTemplates.create_node(node_label), {'props': props})
         except Exception as e:
             logging.exception("An error, %s, occurred while creating a node." % e)
 
@@ -48,29 +58,79 @@ def create_single_node(node_label, props):
 def create_node(node_label, entity_rows):
     for entity in entity_rows:
         if not is_id_exists(entity[Constants.ID], node_label):
-            qb = QueryBuilder()
-            query = qb.create().node(labels=node_label, properties=entity)
-            logging.info("executing query %s" % query)
             try:
-                GraphRepo.execute_query(query)
+                GraphRepo.execute_query(CypherTemplates.create_node(node_label), {'props': entity})
             except Exception as e:
                 logging.exception("An error, %s, occurred while creating a node." % e)
 
 
+def get_chunks(rows, chunk_size=Constants.BATCH_SIZE):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def execute_in_batches(query, rows, chunk_size=Constants.BATCH_SIZE, parameters=None):
+    """
+    runs an UNWIND $rows statement for every chunk of rows; a failing chunk is logged and left out.
+    :return: yields the first record returned for every chunk written.
+    """
+    for chunk in get_chunks(rows, chunk_size):
+        try:
+            records, summary, keys = GraphRepo.execute_query(query, dict(parameters or {}, rows=chunk))
+        except Exception as ex:
+            logging.exception("An error, %s, occurred while writing a chunk of rows." % ex)
+        else:
+            yield records[0]
+
+
+def run_in_batches(query, rows, result_key, chunk_size=Constants.BATCH_SIZE, parameters=None):
+    """
+    runs an UNWIND $rows statement for every chunk of rows.
+    :param result_key: key of the count returned by the statement.
+    :return: sum of the counts returned for every chunk.
+    """
+    return sum(record[result_key] for record in execute_in_batches(query, rows, chunk_size, parameters))
+
+
+def create_nodes_in_batches(node_label, entity_rows, chunk_size=Constants.BATCH_SIZE, journal=None):
+    """
+    UNWIND $rows AS row
+    MERGE (n:<node_label> {id: row.id})
+    ON CREATE SET n += row
+    returns a list of (created, skipped, failed) tuples, one per chunk: skipped rows are ids that already existed,
+    failed rows belong to a chunk whose write raised. the prefix already committed according to the journal (see
+    IngestionJournal) is skipped and counted as one skipped chunk, and every committed chunk is recorded in it.
+    """
+    query = CypherTemplates.merge_nodes(node_label)
+    chunk_counts = []
+    row_number = 0
+    if journal is not None:
+        row_number, entity_rows = journal.skip_committed(entity_rows)
+        if row_number > 0:
+            chunk_counts.append((0, row_number, 0))
+    for chunk in get_chunks(entity_rows, chunk_size):
+        try:
+            records, summary, keys = GraphRepo.execute_query(query, {'rows': chunk})
+        except Exception as ex:
+            logging.exception("An error, %s, occurred while creating a chunk of nodes." % ex)
+            chunk_counts.append((0, 0, len(chunk)))
+        else:
+            created = summary.counters.nodes_created
+            chunk_counts.append((created, len(chunk) - created, 0))
+            if journal is not None:
+                journal.record(row_number, chunk)
+        row_number += len(chunk)
+    return chunk_counts
+
+
 def create_relationship_query(l_label, r_label, rel_entity):
-    qb = QueryBuilder()
-    query_match_left = qb.match() \
-        .node(labels=l_label, ref_name='l') \
-        .where('l.' + Constants.ID, Constants.EQUALS, rel_entity[Constants.SUBJECT])
-    query_match_right = qb.match() \
-        .node(labels=r_label, ref_name='r') \
-        .where('r.' + Constants.ID, Constants.EQUALS, rel_entity[Constants.PREDICT])
-    query_create_rel = qb.create() \
-        .node(ref_name='l') \
-        .related_to(ref_name='rel', label=rel_entity[Constants.NAME]) \
-        .node(ref_name='r')
-    final_query = query_match_left + query_match_right + query_create_rel;
-    return final_query
+    query = CypherTemplates.create_relationship(l_label, r_label, rel_entity[Constants.NAME])
+    parameters = {Constants.SUBJECT: rel_entity[Constants.SUBJECT], Constants.PREDICT: rel_entity[Constants.PREDICT]}
+    return query, parameters
 
 
 def get_label(name_split):
@@ -93,59 +153,133 @@ def parse_relation(relation_row):
     return relation
 
 
-def is_functional_satisfies(node, label, relation):
-    properties = {Constants.ID: node}
-    qb = QueryBuilder()
-    query = qb.match().node(labels=label, ref_name='s', properties=properties) \
-        .related_to(label=relation, ref_name='r') \
-        .node(labels=label, ref_name='p').return_literal('p')
-    try:
-        records, summary, keys = GraphRepo.execute_query(query)
-    except Exception as ex:
-        logging.exception("an exception, %s, occurred while executing the query" % ex)
-        return False
-    return len(records) == 0
-
-
-def check_relationship(relation, subject_label, predict_label):
-    if not is_id_exists(relation[Constants.SUBJECT], subject_label):
-        return False
-    if not is_id_exists(relation[Constants.PREDICT], predict_label):
-        return False
-    if relation[Constants.FUNCTIONAL] == '1' and not is_functional_satisfies(relation[Constants.SUBJECT], subject_label,
-                                                                             relation[Constants.NAME]):
-        return False
-    if relation[Constants.INVERSE_FUNCTIONAL] == '1' and not is_functional_satisfies(relation[Constants.PREDICT],
-                                                                                     predict_label,
-                                                                                     relation[Constants.NAME]):
-        return False
-    return True
-
-
 def create_relationship(relation_rows, subject_label, predict_label):
     success = 0
     failure = 0
+    degree_index = RelationDegreeIndex(subject_label, predict_label)
+    is_valid = get_relation_validator(subject_label, predict_label, degree_index)
     for relation in relation_rows:
         parsed_relation = parse_relation(relation)
-        can_form_relationship = check_relationship(parsed_relation, subject_label, predict_label)
+        can_form_relationship = is_valid(parsed_relation)
         if not can_form_relationship:
             logging.info(
                 " either subject_id %s or object_id %s doesn't exist in database" % (subject_label, predict_label))
             failure += 1
         else:
             try:
-                query = create_relationship_query(subject_label, predict_label, parsed_relation)
-                GraphRepo.execute_query(query)
+                query, parameters = create_relationship_query(subject_label, predict_label, parsed_relation)
+                GraphRepo.execute_query(query, parameters)
             except Exception as ex:
                 logging.exception(
                     "exception  %s occurred while creating relationship between %s and %s" % (
                         ex, subject_label, predict_label))
                 failure += 1
+                degree_index.remove(parsed_relation)
             else:
                 success += 1
     return success, failure
 
 
+def get_existing_ids(node_label):
+    records, summary, keys = GraphRepo.execute_query(CypherTemplates.node_ids(node_label))
+    return {record['id'] for record in records}
+
+
+def get_relation_validator(subject_label, predict_label, degree_index=None):
+    """
+    subject/predict ids are loaded once into sets and functional characteristics are checked against a
+    RelationDegreeIndex, so the returned is_valid(parsed relation) issues no query per row. valid relations are added
+    to the index; pass the degree_index to remove (RelationDegreeIndex.remove) the relations whose write failed.
+    """
+    subject_ids = get_existing_ids(subject_label)
+    predict_ids = get_existing_ids(predict_label)
+    degree_index = degree_index or RelationDegreeIndex(subject_label, predict_label)
+
+    def is_valid(relation):
+        if relation[Constants.SUBJECT] not in subject_ids or relation[Constants.PREDICT] not in predict_ids:
+            logging.info(" either subject_id %s or object_id %s doesn't exist in database" % (
+                relation[Constants.SUBJECT], relation[Constants.PREDICT]))
+            return False
+        if not degree_index.is_functional_satisfied(relation):
+            return False
+        degree_index.add(relation)
+        return True
+
+    return is_valid
+
+
+def validate_relations(relation_rows, subject_label, predict_label, parsed=False):
+    """
+    yields (parsed relation, is_valid) for every row, see get_relation_validator.
+    parsed: True, if the rows already went through parse_relation (e.g. by parse_csv_in_parallel).
+    """
+    is_valid = get_relation_validator(subject_label, predict_label)
+    for relation_row in relation_rows:
+        relation = relation_row if parsed else parse_relation(relation_row)
+        yield relation, is_valid(relation)
+
+
+def group_relations_by_name(relations):
+    grouped = {}  # {relation name: [{subject, predict}]}
+    for relation in relations:
+        grouped.setdefault(relation[Constants.NAME], []).append(
+            {Constants.SUBJECT: relation[Constants.SUBJECT], Constants.PREDICT: relation[Constants.PREDICT]})
+    return grouped
+
+
+def create_relationship_in_batches(relation_rows, subject_label, predict_label, chunk_size=Constants.BATCH_SIZE,
+                                   parsed=False, journal=None):
+    """
+    validates every row locally (see get_relation_validator), then writes one UNWIND statement per chunk and relation
+    name. committed chunks are recorded in the journal (see IngestionJournal); when it resumes a previous run, the
+    chunks it already committed are skipped and relationships are merged instead of created, so replaying a half
+    committed chunk is idempotent.
+    :return: (success, failure, skipped); skipped counts the rows of chunks already committed according to the journal
+             and, when merging, the relationships that already existed.
+    """
+    degree_index = RelationDegreeIndex(subject_label, predict_label)
+    is_valid = get_relation_validator(subject_label, predict_label, degree_index)
+    success = 0
+    failure = 0
+    skipped = 0
+    row_number = 0
+    merge = journal is not None and journal.resume
+    if journal is not None:
+        row_number, relation_rows = journal.skip_committed(relation_rows)
+        skipped += row_number
+    for chunk in get_chunks(relation_rows, chunk_size):
+        relations = chunk if parsed else [parse_relation(relation_row) for relation_row in chunk]
+        valid_relations = [relation for relation in relations if is_valid(relation)]
+        failure += len(chunk) - len(valid_relations)
+        committed = True
+        for relation_name, rows in group_relations_by_name(valid_relations).items():
+            if merge:
+                query = CypherTemplates.merge_relationships(subject_label, predict_label, relation_name)
+            else:
+                query = CypherTemplates.create_relationships(subject_label, predict_label, relation_name)
+            try:
+                records, summary, keys = GraphRepo.execute_query(query, {'rows': rows})
+            except Exception as ex:
+                logging.exception(
+                    "exception  %s occurred while creating relationships between %s and %s" % (
+                        ex, subject_label, predict_label))
+                failure += len(rows)
+                committed = False
+                for row in rows:  # not written, must not count against the functional characteristics of later rows
+                    degree_index.remove(dict(row, **{Constants.NAME: relation_name}))
+            else:
+                created = summary.counters.relationships_created
+                success += created
+                if merge:
+                    skipped += len(rows) - created  # merged onto an existing relationship
+                else:
+                    failure += len(rows) - created
+        if journal is not None and committed:
+            journal.record(row_number, chunk)
+        row_number += len(chunk)
+    return success, failure, skipped
+
+
 def get_subject_predict_label(file_name):
     split_name = file_name.split(Constants.HYPHEN)
     labels = []
@@ -155,6 +289,34 @@ def get_subject_predict_label(file_name):
     return labels[0], labels[1]
 
 
+def get_labels_from_directory(directory):
+    """
+    :return: labels of the entity files of the directory and of both sides of its relation files.
+    """
+    labels = set()
+    for file_name in os.listdir(directory):
+        name, extension = os.path.splitext(file_name)
+        if extension != Constants.DOT + Constants.CSV_EXTENSION:
+            continue
+        if name.startswith(Constants.ENTITY):
+            labels.add(get_label(name.split(Constants.UNDERSCORE)))
+        elif name.startswith(Constants.RELATION):
+            labels.update(get_subject_predict_label(name))
+    return sorted(labels)
+
+
+def bootstrap_schema(directory, check_only=False):
+    labels = get_labels_from_directory(directory)
+    if check_only:
+        missing = SchemaManager.check_schema(labels)
+        for label, prop, used_by in missing:
+            print('missing index on %s.%s, used by %s' % (label, prop, used_by))
+        print('schema check : missing indexes = ' + str(len(missing)))
+    else:
+        for label, prop, status in SchemaManager.ensure_schema(labels):
+            print('%s.%s : %s' % (label, prop, status))
+
+
 def get_post_rect(username, post_data):
     for rec in post_data:
         if rec[Constants.USERNAME] == username:
@@ -163,7 +325,7 @@ def get_post_rect(username, post_data):
 
 
 def insert_student_feedback(feedback_file):
-    feedback_entities = extract_data_from_csv(feedback_file)
+    feedback_entities = read_csv_rows(feedback_file)
     for entity_row in feedback_entities:
         qb = QueryBuilder()
         query = qb.create().node(labels=Constants.KNOWLEDGE_TICKET, properties=entity_row)
@@ -180,6 +342,16 @@ def get_answer(data):
     return ''
 
 
+def get_rows_by_id(rows):
+    """
+    :return: {id: row}, keeping the first row of every id as get_post_data does.
+    """
+    rows_by_id = {}
+    for row in rows:
+        rows_by_id.setdefault(row[Constants.ID], row)
+    return rows_by_id
+
+
 def get_post_data(student_id, exit_data):
     for data in exit_data:
         if data[Constants.ID] == student_id:
@@ -188,10 +360,7 @@ def get_post_data(student_id, exit_data):
 
 
 def parse(ans):
-    ans = re.sub(' ', '', ans).lower()
-    ans = re.sub('\n', '', ans).lower()
-    ans = re.sub('\t', '', ans).lower()
-    return ans
+    return normalize_answer(ans)
 
 
 def get_score(student_answer, correct_options):
@@ -206,16 +375,7 @@ def get_score(student_answer, correct_options):
             correct += 1
         else:
             miss_hits += 1
-    total_co = len(correct_options)
-    if correct == 0:
-        return 0.0
-    if float(correct) / float(total_co) >= 0.1 and miss_hits > 0:
-        return (100 * float(correct) / float(total_co)) - 10
-    if miss_hits == 0:
-        return 100 * float(correct) / float(total_co)
-    if float(correct) / float(total_co) < 0.1 and miss_hits > 0:
-        return 0.0
-    return float(correct) / float(total_co)
+    return AnswerKey.get_score_from_counts(correct, miss_hits, len(correct_options))
 
 
 def get_week_and_checkpoint(entry_file_name):
@@ -295,54 +455,60 @@ def create_student_learn_gain_rel(course_props, student_props, learn_gain_props)
         logging.error('an error occurred while inserting student-learn gain')
 
 
+def create_student_learn_gains(course_id, learn_gain_rows, chunk_size=Constants.BATCH_SIZE, query=None,
+                               parameters=None):
+    """
+    batched create_student_learn_gain_rel, see CypherTemplates.create_student_learn_gains.
+    :param learn_gain_rows: {'student': student props, 'learn_gain': learn gain props} dictionaries.
+    :param query: statement run for every chunk, CypherTemplates.create_student_learn_gains by default.
+    :param parameters: parameters of the statement besides course_id and rows.
+    :return: number of learn gains created.
+    """
+    return run_in_batches(query or CypherTemplates.create_student_learn_gains(), learn_gain_rows, 'created',
+                          chunk_size, dict(parameters or {}, course_id=course_id))
+
+
 def insert_learning_gain(entry_file, exit_file, answers_for_tickets):
-    entry_data = extract_data_from_csv(entry_file)  # parse entry data
-    exit_data = extract_data_from_csv(exit_file)  # parse exit data
+    exit_data = get_rows_by_id(read_csv_rows(exit_file))  # index exit data by student id
     answers_data = extract_data_from_csv(answers_for_tickets)  # parse answers data
     entry_file_name = get_file_name(entry_file)
     exit_file_name = get_file_name(exit_file)
     course_id = input('enter course id:')
-    for pre_data in entry_data:
-        student_id = pre_data[Constants.ID]  # extract student id
-        student_name = pre_data[Constants.NAME]  # extract student name
-        pre_answer = get_answer(pre_data)  # get pre answers given by student
-        post_data = get_post_data(student_id, exit_data)  # get post answers given by student
-        if post_data is None:  # if there is no post data for student, learn gain cannot be computed
-            continue
-        post_answer = get_answer(post_data)  # get post answers given by student
-        # ask professor if entry and exit questions will be same or not
-        correct_options = get_correct_options(answers_data,
-                                              entry_file_name)  # extract all correct options for the given question
-        if correct_options is None:
-            print("answers file does not contains correct options info for this week")
-        pre_score = float(get_score(pre_answer, correct_options))  # compute pre score
-        post_score = float(get_score(post_answer, correct_options))  # compute post score
-        abs_gain = get_abs_gain(pre_score, post_score)  # compute abs
-        norm_gain_one = get_norm_gain(pre_score, post_score, Constants.NORM_ONE)  # compute norm 1
-        norm_gain_two = get_norm_gain(pre_score, post_score, Constants.NORM_TWO)  # compute norm 2
-        sym_gain_two = get_sym_gain(pre_score, post_score, Constants.SYM_ONE)  # compute sym 2
-        wt_gain = get_wt_gain(pre_score, post_score)  # compute weight gain
-        learn_gain_props = {}
-        en_week, en_checkpoint = get_week_and_checkpoint(entry_file_name)  # extracting entry id from file name
-        ex_week, ex_checkpoint = get_week_and_checkpoint(exit_file_name)  # extracting exit id from file name
-        en_id = en_week + " " + en_checkpoint  # creating entry id
-        ex_id = ex_week + " " + ex_checkpoint  # creating exit id
-        learn_gain_props[Constants.ENTRY_ID] = en_id  # properties of learn gain
-        learn_gain_props[Constants.EXIT_ID] = ex_id  # properties of learn gain
-        learn_gain_props[Constants.ABS_GAIN] = abs_gain  # properties of learn gain
-        learn_gain_props[Constants.NORM_GAIN_ONE] = norm_gain_one  # properties of learn gain
-        learn_gain_props[Constants.NORM_GAIN_TWO] = norm_gain_two  # properties of learn gain
-        learn_gain_props[Constants.SYM_GAIN_TWO] = sym_gain_two  # properties of learn gain
-        learn_gain_props[Constants.WT_GAIN] = wt_gain  # properties of learn gain
-        student_props = get_student_props(student_id, student_name)  # get student properties such as name, id
-        course_props = {Constants.ID: course_id}
-        try:
-            GraphRepo.check_connectivity()  # check database connection
-        except Exception as ex:
-            logging.exception(ex)
-        else:
-            create_student_learn_gain_rel(course_props, student_props,
-                                          learn_gain_props)  # create student , learn gain and relation between student and learn gain
+    # ask professor if entry and exit questions will be same or not
+    correct_options = get_correct_options(answers_data,
+                                          entry_file_name)  # extract all correct options for the given question
+    if correct_options is None:
+        print("answers file does not contains correct options info for this week")
+        return
+    en_week, en_checkpoint = get_week_and_checkpoint(entry_file_name)  # extracting entry id from file name
+    ex_week, ex_checkpoint = get_week_and_checkpoint(exit_file_name)  # extracting exit id from file name
+    en_id = en_week + " " + en_checkpoint  # creating entry id
+    ex_id = ex_week + " " + ex_checkpoint  # creating exit id
+    answer_key = AnswerKey(correct_options)  # normalize and compile the correct options once
+
+    def get_learn_gain_rows():
+        for pre_data in read_csv_rows(entry_file):  # stream entry data
+            student_id = pre_data[Constants.ID]  # extract student id
+            post_data = exit_data.get(student_id)  # get post answers given by student
+            if post_data is None:  # if there is no post data for student, learn gain cannot be computed
+                continue
+            pre_score = float(answer_key.score(get_answer(pre_data)))  # compute pre score
+            post_score = float(answer_key.score(get_answer(post_data)))  # compute post score
+            learn_gain_props = {Constants.ENTRY_ID: en_id, Constants.EXIT_ID: ex_id,
+                                Constants.ABS_GAIN: get_abs_gain(pre_score, post_score),
+                                Constants.NORM_GAIN_ONE: get_norm_gain(pre_score, post_score, Constants.NORM_ONE),
+                                Constants.NORM_GAIN_TWO: get_norm_gain(pre_score, post_score, Constants.NORM_TWO),
+                                Constants.SYM_GAIN_TWO: get_sym_gain(pre_score, post_score, Constants.SYM_ONE),
+                                Constants.WT_GAIN: get_wt_gain(pre_score, post_score)}
+            yield {'student': get_student_props(student_id, pre_data[Constants.NAME]), 'learn_gain': learn_gain_props}
+
+    try:
+        GraphRepo.check_connectivity()  # check database connection
+    except Exception as ex:
+        logging.exception(ex)
+    else:
+        created = create_student_learn_gains(course_id, get_learn_gain_rows())  # create student, learn gain, relations
+        print('learn gains created = %d' % created)
 
 
 def get_post_score(exit_data, id):
@@ -454,43 +620,38 @@ def create_relation_instance_student(instance_props, student_props):
         print(ex)
 
 
+def enroll_students_in_batches(instance_id, student_rows, chunk_size=Constants.BATCH_SIZE):
+    """
+    batched create_relation_instance_student, see CypherTemplates.enroll_students.
+    :param student_rows: student props (id, name).
+    :return: number of students enrolled.
+    """
+    return run_in_batches(CypherTemplates.enroll_students(), student_rows, 'enrolled', chunk_size,
+                          {'instance_id': instance_id})
+
+
 def insert_course_instance_assessment_question(assessment_file):
     name = os.path.basename(assessment_file)
     name, ext = name.split(Constants.DOT)
     assessment_id = get_assesment_id(name)
-    assessment_data = extract_data_from_csv(assessment_file)
     print('assessment_id = ' + assessment_id)
-    all_questions = {}
-    for data in assessment_data:
-        all_questions = get_all_questions(data)
-        course_instance = get_course_instance(data)
-        break
-    print(all_questions)
+    first_row = next(read_csv_rows(assessment_file))
+    all_questions = get_all_questions(first_row)
+    course_instance = get_course_instance(first_row)
     print('instance :' + course_instance + ' creating....')
-    instance_props = {Constants.ID: course_instance}
-    create_single_node(Constants.COURSE_INSTANCE, instance_props)
-    print('creating instances for questions.....')
-    for key, val in all_questions.items():
-        question_props = val
-        print('question props...')
-        print(question_props)
-        create_single_node(Constants.QUESTION, question_props)
-    print('Creating instances for assessment')
-    assessment_props = {Constants.ID: assessment_id}
-    create_single_node(Constants.ASSESSMENT, assessment_props)
-    create_relation_instance_assessment_question(instance_props, assessment_props, all_questions)
-    for data in assessment_data:
-        print('************extracting student information*************')
-        student_name = data['name']
-        student_id = data['id']
-        student_props = {Constants.ID: student_id, Constants.NAME: student_name}
-        section_instance = data[Constants.COURSE]
-        score = data[Constants.SCORE]
-        print('student_name :' + student_name)
-        print('student_id: ' + student_id)
-        print('section_instance: ' + section_instance)
-        print("score: " + score)
-        create_relation_instance_student(instance_props, student_props)
+    try:
+        records, summary, keys = GraphRepo.execute_query(CypherTemplates.merge_instance_assessment_questions(),
+                                                         {'instance_id': course_instance,
+                                                          'assessment_id': assessment_id,
+                                                          'questions': list(all_questions.values())})
+    except Exception as ex:
+        logging.exception("An error, %s, occurred while creating the course instance, assessment and questions."
+                          % ex)
+        return
+    print('questions = %d' % records[0]['questions'])
+    student_rows = ({Constants.ID: data['id'], Constants.NAME: data['name']} for data in
+                    read_csv_rows(assessment_file))  # extracting student information
+    print('students enrolled = %d' % enroll_students_in_batches(course_instance, student_rows))
 
 
 def assessment_input():
@@ -536,44 +697,28 @@ def create_student_learn_gain_kg_ticket_rel(course_props, student_props, learn_g
 
 
 def insert_learning_gain_new(entry_file, exit_file):
-    entry_data = extract_data_from_csv(entry_file)  # parse entry data
-    exit_data = extract_data_from_csv(exit_file)  # parse exit data
     entry_file_name = get_file_name(entry_file)
     exit_file_name = get_file_name(exit_file)
     course_id = input("enter course id")
-    for pre_data in entry_data:
-        student_id = pre_data[Constants.ID]  # extract student id
-        student_name = pre_data[Constants.NAME]  # extract student name
-        pre_score = float(pre_data[Constants.POINTS])  # extract pre score
-        post_score = float(get_post_score(exit_data, student_id))  # extract post score
-        if post_score == -1.0:  # this means student doesn't participate in post survey quiz
-            continue
-        print("pre score")
-        print(pre_score)
-        print("post score")
-        print(post_score)
-        abs_gain = get_abs_gain(pre_score, post_score)  # compute abs
-        norm_gain_one = get_norm_gain(pre_score, post_score, Constants.NORM_ONE)  # compute norm 1
-        norm_gain_two = get_norm_gain(pre_score, post_score, Constants.NORM_TWO)  # compute norm 2
-        sym_gain_two = get_sym_gain(pre_score, post_score, Constants.SYM_ONE)  # compute sym 2
-        wt_gain = get_wt_gain(pre_score, post_score)  # compute weight gain
-        learn_gain_props = {Constants.ABS_GAIN: abs_gain, Constants.NORM_GAIN_ONE: norm_gain_one,
-                            Constants.NORM_GAIN_TWO: norm_gain_two, Constants.SYM_GAIN_TWO: sym_gain_two,
-                            Constants.WT_GAIN: wt_gain}
-        student_props = get_student_props(student_id, student_name)  # get student properties such as name, id
-        course_props = {Constants.ID: course_id}
-        entry_id = create_ticket_id(entry_file_name)
-        exit_id = create_ticket_id(exit_file_name)
-        print('exit id = ' + exit_id)
-        print('entry id = ' + entry_id)
-        try:
-            GraphRepo.check_connectivity()  # check database connection
-        except Exception as ex:
-            logging.exception(ex)
-        else:
-            create_student_learn_gain_kg_ticket_rel(course_props, student_props,
-                                                    learn_gain_props, entry_id,
-                                                    exit_id)  # create student , learn gain and relation between student and learn gain
+    cohort_gain = CohortGain.from_rows(read_csv_rows(entry_file), read_csv_rows(exit_file),
+                                       Constants.SYM_ONE)  # compute abs, norm 1, norm 2, sym 2 and weight gains
+    entry_id = create_ticket_id(entry_file_name)
+    exit_id = create_ticket_id(exit_file_name)
+    print('exit id = ' + exit_id)
+    print('entry id = ' + entry_id)
+    try:
+        GraphRepo.check_connectivity()  # check database connection
+    except Exception as ex:
+        logging.exception(ex)
+        return
+    if not is_id_exists(entry_id, Constants.KNOWLEDGE_TICKET_LABEL):
+        print('entry id does not exists in database')
+        return
+    created = create_student_learn_gains(course_id, cohort_gain.rows({Constants.ENTRY_ID: entry_id,
+                                                                      Constants.EXIT_ID: exit_id}),
+                                         query=CypherTemplates.create_student_ticket_learn_gains(),
+                                         parameters={'entry_id': entry_id})
+    print('learn gains created = %d of %d students' % (created, len(cohort_gain)))
 
 
 def create_session_id(ticket, ticket_title):
@@ -632,6 +777,11 @@ def parse_ticket(ticket):
         ticket[key] = parse(val)
 
 
+def normalize_ticket(ticket):
+    parse_ticket(ticket)
+    return ticket
+
+
 def filter_ticket(ticket):
     ticket.pop(Constants.OUTCOMES)
     ticket_copy = dict(ticket).copy();
@@ -641,28 +791,26 @@ def filter_ticket(ticket):
 
 
 def insert_ticket_session_and_outcomes(ticket_file):
-    tickets_data = extract_data_from_csv(ticket_file)
-    for ticket in tickets_data:
-        parse_ticket(ticket)
+    tickets = {}  # {ticket id: {'ticket': ticket props, 'session_id': session id}}
+    sessions = {}  # {session id: {'session', 'outcome', 'question'}}, shared by many tickets
+    for ticket in parse_csv_in_parallel(ticket_file, normalize_ticket):  # tickets are parsed by worker processes
         ticket_title = ticket[Constants.TICKET_TITLE]
         session_id = create_session_id(ticket, ticket_title)
         outcomes = ticket[Constants.OUTCOMES]
         ticket[Constants.ID] = ticket_title
-        session_props = {Constants.ID: session_id}  # session node props
-        outcome_props = {Constants.OUTCOMES: outcomes, Constants.ID: session_id}  # outcome node props
-        question_props = {Constants.ID: session_id, Constants.QUESTION: ticket[Constants.QUESTION]}
+        if session_id not in sessions:  # the first ticket of a session defines its outcome and question
+            sessions[session_id] = {'session': {Constants.ID: session_id},  # session node props
+                                    'outcome': {Constants.OUTCOMES: outcomes, Constants.ID: session_id},
+                                    'question': {Constants.ID: session_id,
+                                                 Constants.QUESTION: ticket[Constants.QUESTION]}}
         filter_ticket(ticket)  # remove unwanted data such as outcomes and questions
-        print("session props : %s" % session_props)
-        print("ticket props : %s" % ticket)
-        print("outcome props : %s" % outcome_props)
-        print("question props : %s" % question_props)
-        print(
-            "*******************************************************************end of one record***************************************************************************" + "\n")
-        create_single_node('Knowledge_Ticket', ticket)  # creating node for ticket
-        create_single_node('Session', session_props)  # creating node for session
-        create_single_node('Learning_Outcome', outcome_props)  # creating node for outcome
-        create_single_node(Constants.QUESTION, question_props)  # creating node for question
-        create_relation_ticket_and_session_and_outcome_question(ticket, session_props, outcome_props, question_props)
+        if ticket_title not in tickets:
+            tickets[ticket_title] = {'ticket': ticket, 'session_id': session_id}
+    created_sessions = run_in_batches(CypherTemplates.merge_sessions_outcomes_questions(), sessions.values(),
+                                      'sessions')  # session, outcome and question nodes and their relations
+    created_tickets = run_in_batches(CypherTemplates.merge_tickets(), tickets.values(),
+                                     'tickets')  # ticket nodes and ticket->session relations
+    print('sessions = %d, tickets = %d' % (created_sessions, created_tickets))
 
 
 def get_file_name(file_path):
@@ -673,24 +821,13 @@ def get_file_name(file_path):
 
 def get_student_learn_gain(course_id, session_id, student_id):
     """
-     MATCH (c:Course_Instance)-[r:HAS_STUDENTS]->(s:Student)-[h:HAS_LEARN_GAIN]->(l:Learn_Gain)
-     WHERE c.id = course_id AND s.id = student_id  AND l.entry_id=session_id
-     RETURN l.abs_gain
+     the learn gain of the student among the gains of the session counted in its stats, see
+     CypherTemplates.student_learn_gain.
     """
-    qb = QueryBuilder()
-    query = qb.match() \
-        .node(labels=Constants.COURSE_INSTANCE, ref_name='course') \
-        .related_to(ref_name='r1', label='HAS_STUDENTS') \
-        .node(labels=Constants.STUDENT, ref_name='student') \
-        .related_to(ref_name='r2', label=Constants.STU_LG_REL) \
-        .node(ref_name='learn_gain', labels=Constants.LEARN_GAIN) \
-        .where_literal(
-        'course.id = ' + quote_value(course_id) + ' AND student.id = ' + quote_value(
-            student_id) + ' AND learn_gain.entry_id = ' + quote_value(
-            session_id)).return_literal('learn_gain.abs_gain as gain')
-    print('executing query.....' + str(query))
     try:
-        records, summary, keys = GraphRepo.execute_query(query)
+        records, summary, keys = GraphRepo.execute_query(CypherTemplates.student_learn_gain(),
+                                                         {'course_id': course_id, 'student_id': student_id,
+                                                          'session_id': session_id})
         for record in records:
             return record['gain']
     except Exception as e:
@@ -704,21 +841,10 @@ def get_session_learn_gains(course_id, session_id):
     WHERE course.id =<course_id> AND learn_gain.entry_id=<session_id>
     RETURN learn_gain.abs_gain
     """
-    qb = QueryBuilder()
     gains = []
-    query = qb.match() \
-        .node(labels=Constants.COURSE_INSTANCE, ref_name='course') \
-        .related_to(ref_name='r1', label='HAS_STUDENTS') \
-        .node(labels=Constants.STUDENT, ref_name='student') \
-        .related_to(ref_name='r2', label=Constants.STU_LG_REL) \
-        .node(ref_name='learn_gain', labels=Constants.LEARN_GAIN) \
-        .where_literal(
-        'course.id = ' + quote_value(course_id) + ' AND learn_gain.entry_id = ' + quote_value(
-            session_id)).return_literal(
-        'learn_gain.abs_gain as gain')
-    print('executing query.....' + str(query))
     try:
-        records, summary, keys = GraphRepo.execute_query(query)
+        records, summary, keys = GraphRepo.execute_query(CypherTemplates.session_learn_gains(),
+                                                         {'course_id': course_id, 'session_id': session_id})
         for record in records:
             gains.append(record['gain'])
     except Exception as e:
@@ -726,30 +852,27 @@ def get_session_learn_gains(course_id, session_id):
     return gains
 
 
+def get_learn_gain_stats(course_id, session_id):
+    """
+    :return: {'count', 'mean', 'm2'} of the learn gains of the session, or None (see SessionFeedback.get_stats).
+    """
+    return SessionFeedback.get_stats(course_id, session_id)
+
+
 def get_feedback(course_id, student_id, session_id):  # change it to learning gain feedback
     student_learn_gain = get_student_learn_gain(course_id, session_id,
                                                 student_id)  # get student learn gain for the given session
-    session_learn_gains = get_session_learn_gains(course_id,
-                                                  session_id)  # get all learn gains of the student for the given session
-    if student_learn_gain is None or session_learn_gains is None:
+    stats = get_learn_gain_stats(course_id, session_id)  # get count, mean and m2 of the learn gains of the session
+    if student_learn_gain is None or stats is None or stats['count'] < 2:
         return Constants.DATA_NOT_EXISTS_IN_DATABASE
     print('********************************Data retrieved from database**********************')
     print(student_learn_gain)
-    print(session_learn_gains)
+    print(stats)
     print('*********************************************************************************')
-    mean = statistics.mean(session_learn_gains)
-    standard_deviation = statistics.stdev(session_learn_gains)
+    mean, standard_deviation = SessionFeedback.get_mean_and_standard_deviation(stats)  # sample standard deviation
     print('mean = ' + str(mean))
     print('SD = ' + str(standard_deviation))
-    if student_learn_gain > mean + (3 * standard_deviation):
-        return 'feedback_one'
-    if student_learn_gain > mean + (2 * standard_deviation):
-        return 'feedback_two'
-    if student_learn_gain > mean + standard_deviation:
-        return 'feedback_three'
-    if student_learn_gain > mean - (3 * standard_deviation):
-        return 'feedback_four'
-    return 'feedback_five'
+    return SessionFeedback.classify(student_learn_gain, mean, standard_deviation).item()
 
 
 def get_meta_data(grades):
@@ -776,16 +899,17 @@ def insert_assessment_data(meta_data):
        attributes: id (canvas_item_id), title (canvas_item_title), points (points)
     """
     avoid_list = ['Student', 'SIS Login ID', 'Section']
+    assessment_rows = []
     for key, val in meta_data.items():
         if key in avoid_list:
             continue
         canvas_id, canvas_title = get_canvas_id_and_title(key)
-        points = val
-        assessment_props = {Constants.ID: canvas_id, Constants.CANVAS_TITLE: canvas_title, Constants.POINTS: points}
-        try:
-            create_single_node(Constants.ASSESSMENT, assessment_props)
-        except Exception as ex:
-            logging.error('error occurred while inserting assessment entity')
+        assessment_rows.append({Constants.ID: canvas_id, Constants.CANVAS_TITLE: canvas_title, Constants.POINTS: val})
+    chunk_counts = create_nodes_in_batches(Constants.ASSESSMENT, assessment_rows)  # existing assessments are kept
+    print('assessments created = %d failed = %d' % (sum(count[0] for count in chunk_counts),
+                                                     sum(count[2] for count in chunk_counts)))
+    PerformanceEngine.refresh_assessments(
+        [row[Constants.ID] for row in assessment_rows])  # assessment points by type changed
 
 
 def get_id_by_name(name):
@@ -840,27 +964,66 @@ def create_relation_student_submission_assessment(student_id, canvas_id, submiss
         logging.exception("An error, %s, occurred while creating a student->submission<->assessment relation." % ex)
 
 
+def normalize_student_name(name):
+    return ' '.join(str(name).split()).lower()
+
+
+def get_student_ids_by_name():
+    """
+    get_id_by_name for every student, in one query.
+    :return: {normalized name: id}, keeping the first student of a name.
+    """
+    records, summary, keys = GraphRepo.execute_query(CypherTemplates.student_names())
+    student_ids = {}
+    for record in records:
+        student_ids.setdefault(normalize_student_name(record['name']), record['id'])
+    return student_ids
+
+
+def create_submissions_in_batches(submission_rows, chunk_size=Constants.BATCH_SIZE):
+    """
+    batched create_relation_student_submission_assessment, see CypherTemplates.create_submissions.
+    :param submission_rows: (student_id, canvas_id, score) tuples.
+    :return: number of submissions created.
+    """
+    rows = ({'student_id': student_id, 'canvas_id': canvas_id, Constants.SCORE: score} for
+            student_id, canvas_id, score in submission_rows)
+    return run_in_batches(CypherTemplates.create_submissions(), rows, 'created', chunk_size)
+
+
 def student_submission_assessment(grades_file):
-    grades = extract_data_from_csv(grades_file)
-    meta_data = get_meta_data(grades)  # second row of the grades data contains metadata
+    meta_data = get_meta_data(read_csv_rows(grades_file))  # second row of the grades data contains metadata
     insert_assessment_data(meta_data)  # inserts metadata into the knowledge graph
     avoid_list = ['Student', 'SIS Login ID', 'Section']  # Since I only require scores, avoiding other columns
-    for grade in grades:
-        if grade[Constants.STUDENT] == 'meta_data':  # avoiding metadata row as the insertion was already performed
-            continue
-        student_id = get_id_by_name(
-            format_student_name(grade[Constants.STUDENT]))  # extracting id from student firstname and lastname
-        for key, val in grade.items():
-            if key in avoid_list:
+    canvas_ids = {key: get_canvas_id_and_title(key)[0] for key in meta_data if
+                  key not in avoid_list}  # extracting canvas_id of every assessment column once
+    student_ids_by_name = get_student_ids_by_name()  # resolving all student names with one query
+    student_ids = set()
+    unresolved = []
+
+    def get_submission_rows():
+        for grade in read_csv_rows(grades_file):
+            if grade[Constants.STUDENT] == 'meta_data':  # avoiding metadata row as the insertion was already performed
+                continue
+            try:
+                student_id = student_ids_by_name.get(normalize_student_name(
+                    format_student_name(grade[Constants.STUDENT])))  # extracting id from student firstname and lastname
+            except IndexError:  # name is not in "last, first" format
+                student_id = None
+            if student_id is None:
+                unresolved.append(grade[Constants.STUDENT])
                 continue
-            canvas_id, canvas_title = get_canvas_id_and_title(key)  # extracting canvas_id and canvas_title
-            score = 0
-            if val:  # if score exists, type cast it to float. otherwise, score remains zero
-                score = float(val)
-            submission_props = {Constants.ID: canvas_id,
-                                Constants.SCORE: score}  # constructing submission props
-            create_relation_student_submission_assessment(student_id, canvas_id,
-                                                          submission_props)  # function creates student->submission->assessment relation
+            student_ids.add(student_id)
+            for key, canvas_id in canvas_ids.items():
+                val = grade.get(key)
+                score = 0
+                if val:  # if score exists, type cast it to float. otherwise, score remains zero
+                    score = float(val)
+                yield student_id, canvas_id, score
+
+    created = create_submissions_in_batches(get_submission_rows())  # creates student->submission->assessment relations
+    print('submissions created = %d, students not found = %d' % (created, len(unresolved)))
+    PerformanceEngine.refresh_students(student_ids)  # update the score sums and performance stored on the students
 
 
 def input_learning_gain():
@@ -886,19 +1049,40 @@ def student_submission_assessment_input():
     student_submission_assessment(file)
 
 
+def update_assessments(assessment_rows, chunk_size=Constants.BATCH_SIZE):
+    """
+    sets the given properties of existing assessments, see CypherTemplates.update_assessments.
+    :param assessment_rows: {'id': canvas id, 'props': properties to set} dictionaries.
+    :return: number of assessments matched and the ids of the assessments that do not exist.
+    """
+    matched = 0
+    missing = []
+    for record in execute_in_batches(CypherTemplates.update_assessments(), assessment_rows, chunk_size):
+        matched += record['matched']
+        missing += record['missing']
+    return matched, missing
+
+
 def add_schema_type_to_assessment(file):
-    rows = extract_data_from_csv(file)
-    for row in rows:
-        assessment = row['assessment']
-        type = row['type']
-        id, title = get_canvas_id_and_title(assessment)
-        Qb = QueryBuilder()
-        query = Qb.match().node(labels='ASSESSMENT', properties={Constants.ID: id}, ref_name='a').set(
-            properties={"a.type": type})
-        try:
-            GraphRepo.execute_query(query)
-        except Exception as ex:
-            print(str(ex))
+    """
+    columns: assessment (gradebook column name, see get_canvas_id_and_title), type and optionally points. the title
+    parsed from the assessment column is stored as canvas_title.
+    """
+    assessment_rows = []
+    for row in read_csv_rows(file):
+        id, title = get_canvas_id_and_title(row['assessment'])
+        props = {Constants.TYPE: row[Constants.TYPE]}
+        if title:
+            props[Constants.CANVAS_TITLE] = title
+        if row.get(Constants.POINTS):
+            props[Constants.POINTS] = row[Constants.POINTS]
+        assessment_rows.append({Constants.ID: id, 'props': props})
+    matched, missing = update_assessments(assessment_rows)
+    print('assessments matched = %d, missing = %d' % (matched, len(missing)))
+    if missing:
+        print('missing assessments : %s' % missing)
+    PerformanceEngine.refresh_assessments(
+        [row[Constants.ID] for row in assessment_rows])  # assessment types and points changed
 
 
 def input_add_schema_type_to_assessment():
@@ -963,69 +1147,75 @@ def compute_learn_gain(student):
     return learn_gain
 
 
-def generate_plot_one(target_student):
-    students = get_students()
-    x = []
-    y = []
-    colors = []
-    for student in students:
-        learn_gain = compute_learn_gain(student)
-        performance = measure_student_performance(student)
-        x.append(learn_gain)
-        y.append(performance)
-        if student == target_student:
-            colors.append('red')
-        else:
-            colors.append('gray')
-    plt.scatter(x, y, c=colors)
-    plt.xlabel("Learn Gain")
-    plt.ylabel("Performance")
-    plt.show()
+def get_learn_gains_by_student():
+    """
+    compute_learn_gain of every student, in one query.
+    :return: {student id: sum of the abs gains of the student}
+    """
+    records, summary, keys = GraphRepo.execute_query(CypherTemplates.student_learn_gain_sums())
+    return {record['id']: record['gain'] for record in records}
+
+
+def generate_plot_one(target_student, output_file='performance_vs_learn_gain.png'):
+    """
+    scatter plot of performance vs learn gain of every student, the target student in red. the figure is rendered
+    without a display (Agg) to output_file, png or svg by its extension. above Constants.HEXBIN_THRESHOLD students,
+    the students are drawn as hexagonal density bins instead of one marker each.
+    """
+    learn_gains = get_learn_gains_by_student()
+    performances = PerformanceEngine.get_performances()
+    students = list(learn_gains)
+    x = [learn_gains[student] for student in students]
+    y = [performances.get(student, 0.0) for student in students]
+    figure = Figure()
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot()
+    if len(students) > Constants.HEXBIN_THRESHOLD:
+        figure.colorbar(axes.hexbin(x, y, gridsize=50, mincnt=1, cmap='Greys'), ax=axes, label='students')
+    else:
+        axes.scatter(x, y, c='gray')
+    if target_student in learn_gains:
+        axes.scatter([learn_gains[target_student]], [performances.get(target_student, 0.0)], c='red')
+    axes.set_xlabel("Learn Gain")
+    axes.set_ylabel("Performance")
+    figure.savefig(output_file)
+    return output_file
 
 
 def measure_student_performance(student):
-    student_scores = {}  # {type: <total_score>}
-    assessment_points = {}  # {type: <total_points>}
-    for schema_type, weight in Constants.SCORING_SCHEMA.items():
-        student_scores[schema_type] = 0  # initialising to zero
-        assessment_points[schema_type] = 0  # initialising to zero
-        student_scores_for_schema_type = get_student_scores_by_type(student,
-                                                                    schema_type)  # retrieving student scores of the given schema type
-        assessment_points_for_schema_type = get_assessment_scores_by_type(
-            schema_type)  # retrieving total points of the given schema type
-        student_scores[schema_type] = perform_sum(student_scores_for_schema_type)  # compute sum
-        assessment_points[schema_type] = perform_sum(assessment_points_for_schema_type)  # compute sum
-    performances = {}
-    for schema_type, weight in Constants.SCORING_SCHEMA.items():
-        performance = 0.0
-        if assessment_points[schema_type] != 0.0:
-            performance = (student_scores[schema_type] / assessment_points[schema_type]) * (
-                    weight * 100)  # compute performance for each schema type
-        performances[schema_type] = performance
-    # print(performances)
-    total = 0
-    for performance in performances.values():
-        total += performance
-    # print("overall performance : " + str(total))
-    return total
-
-
-def create_entity_and_relations():
+    """
+    reads the performance stored on the student (see PerformanceEngine.refresh_students); measured from the
+    submissions with one query if the student was not refreshed yet.
+    """
+    return PerformanceEngine.get_performance(student)
+
+
+def create_entity_and_relations(resume=False):
     file_path = input('Enter the path of the file- do not enclose path in single/double quotes: ')
     file_name = os.path.basename(file_path)
     file_name, extension = file_name.split(Constants.DOT)
     try:
         if str(file_name).startswith(Constants.ENTITY):
-            entity_rows = extract_data_from_csv(str(file_path))
+            entity_rows = read_csv_rows(str(file_path))
             file_name_split = file_name.split(Constants.UNDERSCORE)
             label = get_label(file_name_split)
-            create_node(label, entity_rows)
+            SchemaManager.ensure_schema([label])
+            journal = IngestionJournal(str(file_path), resume)
+            chunk_counts = create_nodes_in_batches(label, entity_rows, journal=journal)
+            created = sum(count[0] for count in chunk_counts)
+            skipped = sum(count[1] for count in chunk_counts)
+            failed = sum(count[2] for count in chunk_counts)
+            print("entity status : created = " + str(created) + " skipped = " + str(skipped) + " failed = " +
+                  str(failed))
         elif str(file_name).startswith(Constants.RELATION):
-            relation_rows = extract_data_from_csv(str(file_path))
-            print(relation_rows)
+            relations = parse_csv_in_parallel(str(file_path), parse_relation)  # rows are parsed by worker processes
             subject_label, predict_label = get_subject_predict_label(file_name)
-            success, failure = create_relationship(relation_rows, subject_label, predict_label)
-            print("relationship status : success = " + str(success) + " failure = " + str(failure))
+            SchemaManager.ensure_schema([subject_label, predict_label])
+            journal = IngestionJournal(str(file_path), resume)
+            success, failure, skipped = create_relationship_in_batches(relations, subject_label, predict_label,
+                                                                       parsed=True, journal=journal)
+            print("relationship status : success = " + str(success) + " failure = " + str(failure) + " skipped = " +
+                  str(skipped))
         else:
             print("invalid file format")
     except Exception as ex:
@@ -1036,6 +1226,11 @@ def create_entity_and_relations():
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--resume', action='store_true',
+                        help='option 1: read the journal written by a previous (crashed) run of the same file, skip '
+                             'the chunks it committed and merge the relationships of the replayed ones')
+    args = parser.parse_args()
     print('1. create entities and relations. Need two entity files and one relation file)')
     print('2. insert learn gain (old)')
     print('3. insert learn gain (new)')
@@ -1046,9 +1241,11 @@ if __name__ == '__main__':
     print('8. measure student performance. Need student id as input')
     print('9. get feedback for a given session. Input: course ID, student ID, session Id. ')
     print('10. generate scatter plot performance vs student learn gain')
+    print('11. create (or check) constraints and indexes. Input: directory of entity and relation files')
+    print('12. get feedback of every student of a session. Input: course ID, session Id, optional csv output file')
     option = int(input('choose one of the option above and hit enter:\n'))
     if option == 1:
-        create_entity_and_relations()
+        create_entity_and_relations(args.resume)
     elif option == 2:
         input_learning_gain()
     elif option == 3:
@@ -1071,5 +1268,21 @@ if __name__ == '__main__':
         print(get_feedback(course_instance_id, student_id, session_id))
     elif option == 10:
         student_id = input('enter student id')
-        generate_plot_one(student_id)
-
+        output_file = input(
+            'enter output file (.png or .svg), or leave empty for performance_vs_learn_gain.png').strip()
+        print('plot written to ' + generate_plot_one(student_id, output_file or 'performance_vs_learn_gain.png'))
+    elif option == 11:
+        directory = input('enter directory of entity and relation files')
+        check_only = input('only check for missing indexes? (y/n)').strip().lower() == 'y'
+        bootstrap_schema(directory, check_only)
+    elif option == 12:
+        course_instance_id = input('course instance id')
+        session_id = input('enter session id. Ex: w5b entry')
+        output_file = input('enter csv output file, or leave empty to print the feedback').strip()
+        session_feedback = SessionFeedback.get_feedback(course_instance_id, session_id)
+        if not session_feedback:
+            print(Constants.DATA_NOT_EXISTS_IN_DATABASE)
+        elif output_file:
+            SessionFeedback.write_csv(session_feedback, output_file)
+        else:
+            print(session_feedback)